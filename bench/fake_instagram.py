@@ -0,0 +1,240 @@
+"""In-process stand-in for ``instagrapi.Client``.
+
+Responses are built in Instagram's wire format and parsed with instagrapi's
+own extractors, so the servers see the same models they would in production.
+Every upstream call sleeps for ``latency`` seconds to mimic the round-trip.
+"""
+import random
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+from instagrapi.exceptions import UserNotFound
+from instagrapi.extractors import extract_direct_thread, extract_user_v1
+
+VIEWER_PK = "100"
+BASE_PK = 1_000_000
+EPOCH_US = 1_700_000_000 * 1_000_000
+
+WORDS = (
+    "hey coffee tonight weekend concert hiking beach sunset playlist pizza gym "
+    "movie museum travel tokyo lisbon dog cat brunch tacos running book vinyl"
+).split()
+
+
+class FakeInstagram:
+    """The shared fake "backend": a deterministic inbox and user directory."""
+
+    def __init__(self, threads: int = 200, messages_per_thread: int = 200, seed: int = 7):
+        rng = random.Random(seed)
+        self.users = {}
+        self.threads = []
+        for i in range(threads):
+            pk = str(BASE_PK + i)
+            self.users[pk] = {
+                "pk": pk,
+                "username": f"user{i:04d}",
+                "full_name": f"Test User {i}",
+                "biography": " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 30))),
+                "follower_count": rng.randint(10, 50_000),
+                "following_count": rng.randint(10, 2_000),
+                "media_count": rng.randint(0, 900),
+            }
+            last_activity = EPOCH_US + (threads - i) * 3_600_000_000
+            items = []
+            timestamp = last_activity
+            for j in range(messages_per_thread):
+                items.append({
+                    "item_id": f"{pk}{j:06d}",
+                    "user_id": int(rng.choice((VIEWER_PK, pk))),
+                    "timestamp": timestamp,
+                    "item_type": "text",
+                    "text": " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 25))),
+                    "is_shh_mode": False,
+                })
+                timestamp -= rng.randint(30, 7_200) * 1_000_000
+            self.threads.append({
+                "thread_id": f"3402823668415103{i:08d}",
+                "thread_v2_id": f"17898572618{i:06d}",
+                "pk": pk,
+                "last_activity_at": last_activity,
+                "items": items,
+            })
+
+    def user_short(self, pk: str) -> Dict[str, Any]:
+        user = self.users[pk]
+        return {
+            "pk": pk,
+            "username": user["username"],
+            "full_name": user["full_name"],
+            "profile_pic_url": f"https://cdn.example.invalid/{pk}.jpg",
+            "is_private": False,
+        }
+
+    def raw_thread(self, index: int, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        thread = self.threads[index]
+        user = self.user_short(thread["pk"])
+        return {
+            "thread_id": thread["thread_id"],
+            "thread_v2_id": thread["thread_v2_id"],
+            "users": [user],
+            "inviter": dict(user, pk=VIEWER_PK, username="viewer"),
+            "left_users": [],
+            "admin_user_ids": [],
+            "items": [dict(item) for item in items],
+            "last_activity_at": thread["last_activity_at"],
+            "muted": False,
+            "is_pin": False,
+            "named": False,
+            "canonical": True,
+            "pending": False,
+            "archived": False,
+            "thread_type": "private",
+            "thread_title": user["username"],
+            "folder": 0,
+            "vc_muted": False,
+            "is_group": False,
+            "mentions_muted": False,
+            "approval_required_for_new_members": False,
+            "input_mode": 0,
+            "business_thread_folder": 0,
+            "read_state": 0,
+            "is_close_friend_thread": False,
+            "assigned_admin_id": 0,
+            "shh_mode_enabled": False,
+            "last_seen_at": {},
+            "has_older": len(items) < len(thread["items"]),
+        }
+
+
+class FakeClient:
+    """Drop-in for the subset of ``instagrapi.Client`` the servers use."""
+
+    backend = FakeInstagram()
+    latency = 0.05
+    inbox_chunk = 20
+
+    def __init__(self, *args, **kwargs):
+        self.settings: Dict[str, Any] = {}
+        self.user_id: Optional[str] = None
+        self.calls = 0
+
+    def _roundtrip(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    # Session handling
+
+    def login(self, username: str, password: str, relogin: bool = False) -> bool:
+        self._roundtrip()
+        self.user_id = VIEWER_PK
+        self.settings = {"authorization_data": {"ds_user_id": VIEWER_PK}, "username": username}
+        return True
+
+    def get_settings(self) -> Dict[str, Any]:
+        return dict(self.settings)
+
+    def set_settings(self, settings: Dict[str, Any]) -> bool:
+        self.settings = dict(settings)
+        self.user_id = settings.get("authorization_data", {}).get("ds_user_id")
+        return True
+
+    def load_settings(self, path) -> Dict[str, Any]:
+        return self.settings
+
+    def dump_settings(self, path) -> bool:
+        return True
+
+    # Users
+
+    def _find(self, username: str) -> str:
+        for pk, user in self.backend.users.items():
+            if user["username"] == username:
+                return pk
+        raise UserNotFound(username=username)
+
+    def user_id_from_username(self, username: str) -> str:
+        self._roundtrip()
+        return self._find(username)
+
+    def username_from_user_id(self, user_id) -> str:
+        self._roundtrip()
+        return self.backend.users[str(user_id)]["username"]
+
+    def user_info(self, user_id):
+        self._roundtrip()
+        user = self.backend.users[str(user_id)]
+        return extract_user_v1(dict(
+            self.backend.user_short(str(user_id)),
+            biography=user["biography"],
+            follower_count=user["follower_count"],
+            following_count=user["following_count"],
+            media_count=user["media_count"],
+            is_verified=False,
+            is_business=False,
+            external_url=None,
+            account_type=1,
+            hd_profile_pic_url_info={"url": f"https://cdn.example.invalid/{user_id}_hd.jpg"},
+            pinned_channels_info={"pinned_channels_list": []},
+        ))
+
+    # Direct
+
+    def direct_threads_chunk(self, selected_filter: str = "", box: str = "",
+                             thread_message_limit: Optional[int] = None,
+                             cursor: Optional[str] = None) -> Tuple[list, Optional[str]]:
+        self._roundtrip()
+        start = int(cursor or 0)
+        end = min(start + self.inbox_chunk, len(self.backend.threads))
+        limit = thread_message_limit or 10
+        threads = [
+            extract_direct_thread(self.backend.raw_thread(i, self.backend.threads[i]["items"][:limit]))
+            for i in range(start, end)
+        ]
+        return threads, (str(end) if end < len(self.backend.threads) else None)
+
+    def direct_threads(self, amount: int = 20, selected_filter: str = "", box: str = "",
+                       thread_message_limit: Optional[int] = None) -> list:
+        threads, cursor = [], None
+        while len(threads) < amount:
+            chunk, cursor = self.direct_threads_chunk(selected_filter, box, thread_message_limit, cursor)
+            threads.extend(chunk)
+            if not cursor:
+                break
+        return threads[:amount]
+
+    def direct_pending_chunk(self, cursor: Optional[str] = None) -> Tuple[list, Optional[str]]:
+        self._roundtrip()
+        return [], None
+
+    def direct_pending_inbox(self, amount: int = 20) -> list:
+        return self.direct_pending_chunk()[0]
+
+    def private_request(self, endpoint: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
+        self._roundtrip()
+        thread_id = endpoint.strip("/").split("/")[-1]
+        params = params or {}
+        index = next(i for i, t in enumerate(self.backend.threads) if t["thread_id"] == thread_id)
+        items = self.backend.threads[index]["items"]
+        start = int(params.get("cursor") or 0)
+        end = min(start + int(params.get("limit", 20)), len(items))
+        thread = self.backend.raw_thread(index, items[start:end])
+        thread["has_older"] = end < len(items)
+        thread["oldest_cursor"] = str(end) if end < len(items) else None
+        return {"thread": thread, "status": "ok"}
+
+    def direct_thread(self, thread_id, amount: int = 20):
+        thread = self.private_request(f"direct_v2/threads/{thread_id}/", params={"limit": amount})["thread"]
+        return extract_direct_thread(thread)
+
+    def direct_messages(self, thread_id, amount: int = 20) -> list:
+        return self.direct_thread(thread_id, amount).messages
+
+    def direct_search(self, query: str) -> list:
+        self._roundtrip()
+        return []
+
+    def direct_send(self, text: str, user_ids: List[int] = (), thread_ids: List[int] = ()):
+        self._roundtrip()
+        return SimpleNamespace(id=f"sent{self.calls}", text=text)
@@ -0,0 +1,77 @@
+"""Local stand-in for ``https://api.perplexity.ai/chat/completions``.
+
+Serves plain and streaming (SSE) completions after a configurable delay, on
+a background uvicorn server bound to 127.0.0.1.
+"""
+import asyncio
+import json
+import socket
+import threading
+import time
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+LINE = "Are you a sunset playlist? Because I could listen to you on repeat all weekend."
+
+
+class FakePerplexity:
+    def __init__(self, latency: float = 0.8, token_interval: float = 0.02):
+        self.latency = latency
+        self.token_interval = token_interval
+        self.requests = 0
+        self.app = Starlette(routes=[Route("/chat/completions", self.completions, methods=["POST"])])
+        self._server = None
+        self._thread = None
+        self.port = None
+
+    async def completions(self, request: Request):
+        body = await request.json()
+        self.requests += 1
+        prompt_chars = sum(len(m.get("content", "")) for m in body.get("messages", []))
+        usage = {"prompt_tokens": prompt_chars // 4, "completion_tokens": len(LINE) // 4}
+        if body.get("stream"):
+            return StreamingResponse(self._stream(body["model"], usage), media_type="text/event-stream")
+        await asyncio.sleep(self.latency)
+        return JSONResponse({
+            "id": f"fake-{self.requests}",
+            "model": body["model"],
+            "created": int(time.time()),
+            "usage": usage,
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": LINE}}],
+        })
+
+    async def _stream(self, model: str, usage: dict):
+        await asyncio.sleep(self.latency / 2)
+        words = LINE.split(" ")
+        for i, word in enumerate(words):
+            await asyncio.sleep(self.token_interval)
+            delta = word if i == 0 else " " + word
+            chunk = {"model": model, "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+        done = {"model": model, "usage": usage, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        yield f"data: {json.dumps(done)}\n\n"
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/chat/completions"
+
+    def start(self) -> "FakePerplexity":
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        config = uvicorn.Config(self.app, host="127.0.0.1", port=self.port, log_level="warning", lifespan="off")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, name="fake-perplexity", daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.should_exit = True
+            self._thread.join(timeout=5)
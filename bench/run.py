@@ -0,0 +1,255 @@
+"""Offline load profiles for the HTTP and MCP servers.
+
+Instagram is replaced by ``FakeClient`` and Perplexity by a local stub, so
+runs are repeatable and cost nothing. Each profile drives one endpoint or
+tool with a fixed number of concurrent workers and reports p50/p95/p99
+latency, throughput and process RSS.
+
+    python bench/run.py                        # all profiles
+    python bench/run.py -p list_contacts -n 500 -c 16
+    python bench/run.py --ig-latency 0.2 --llm-latency 1.5 --output bench_output.txt
+    python bench/run.py -p cold_start --cold-starts 10
+
+``cold_start`` starts the HTTP server in fresh interpreters and reports the
+time until its lifespan has started (the ``import_p50_ms`` field has the
+import share); background prewarming is disabled there.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "bench"))
+
+from fake_instagram import FakeClient  # noqa: E402
+from fake_perplexity import FakePerplexity  # noqa: E402
+
+
+def rss_mb() -> float:
+    """Current resident set size (falls back to the peak where /proc is missing)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def drive(name: str, call: Callable[[int], Awaitable[bool]], requests: int, concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                ok = await call(i)
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "profile": name,
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "throughput_rps": requests / elapsed if elapsed else 0.0,
+        "rss_mb": rss_mb(),
+        "rss_delta_mb": rss_mb() - rss_before,
+    }
+
+
+COLD_START = """
+import asyncio, json, resource, sys, time
+start = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import http_server
+imported = time.perf_counter() - start
+
+async def main():
+    async with http_server.app.router.lifespan_context(http_server.app):
+        return time.perf_counter() - start
+
+ready = asyncio.run(main())
+print(json.dumps({"import": imported, "ready": ready, "maxrss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+"""
+
+
+def cold_start(runs: int) -> Dict[str, Any]:
+    env = dict(os.environ, JUSTRIZZ_PREWARM="0", JUSTRIZZ_IG_USERNAME="", JUSTRIZZ_LOG_LEVEL="WARNING")
+    samples, errors = [], 0
+    started = time.perf_counter()
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-c", COLD_START, str(ROOT / "src")],
+                              capture_output=True, text=True, env=env, cwd=env["JUSTRIZZ_DATA_DIR"])
+        if proc.returncode:
+            errors += 1
+            continue
+        samples.append(json.loads(proc.stdout.splitlines()[-1]))
+    elapsed = time.perf_counter() - started
+    ready = [s["ready"] for s in samples] or [0.0]
+    maxrss = max((s["maxrss"] for s in samples), default=0)
+    return {
+        "profile": "cold_start",
+        "requests": runs,
+        "concurrency": 1,
+        "errors": errors,
+        "p50_ms": percentile(ready, 50) * 1000,
+        "p95_ms": percentile(ready, 95) * 1000,
+        "p99_ms": percentile(ready, 99) * 1000,
+        "mean_ms": statistics.fmean(ready) * 1000,
+        "import_p50_ms": percentile([s["import"] for s in samples] or [0.0], 50) * 1000,
+        "throughput_rps": runs / elapsed if elapsed else 0.0,
+        "rss_mb": maxrss / 2**20 if sys.platform == "darwin" else maxrss / 2**10,
+        "rss_delta_mb": 0.0,
+    }
+
+
+def http_profiles(http, token: str, threads: List[str], usernames: List[str]):
+    def ok(response) -> bool:
+        return response.status_code == 200 and response.json().get("success", False)
+
+    async def list_contacts(i):
+        return ok(await http.get("/api/list_contacts", params={"session_token": token}))
+
+    async def list_messages(i):
+        thread_id = threads[i % len(threads)]
+        return ok(await http.get("/api/list_messages", params={"session_token": token, "thread_id": thread_id, "amount": 50}))
+
+    async def analyze_contact(i):
+        body = {"session_token": token, "username": usernames[i % len(usernames)], "force_refresh": True}
+        return ok(await http.post("/api/analyze_contact", json=body))
+
+    async def analyze_contact_cached(i):
+        body = {"session_token": token, "username": usernames[i % 5]}
+        return ok(await http.post("/api/analyze_contact", json=body))
+
+    return {
+        "list_contacts": list_contacts,
+        "list_messages": list_messages,
+        "analyze_contact": analyze_contact,
+        "analyze_contact_cached": analyze_contact_cached,
+    }
+
+
+def mcp_profiles(mcp, threads: List[str], usernames: List[str]):
+    async def call(tool: str, arguments: Dict[str, Any]) -> bool:
+        result = await mcp.call_tool(tool, arguments)
+        return json.loads(result[0].text).get("success", False)
+
+    async def mcp_list_chats(i):
+        return await call("list_chats", {"amount": 20})
+
+    async def mcp_list_messages(i):
+        return await call("list_messages", {"thread_id": threads[i % len(threads)], "amount": 50})
+
+    async def mcp_get_user_id(i):
+        return await call("get_user_id_from_username", {"username": usernames[i % len(usernames)]})
+
+    return {
+        "mcp_list_chats": mcp_list_chats,
+        "mcp_list_messages": mcp_list_messages,
+        "mcp_get_user_id": mcp_get_user_id,
+    }
+
+
+async def main(args) -> List[Dict[str, Any]]:
+    import httpx
+    from fastmcp import Client as MCPClient
+
+    import client_pool
+    import http_server
+    import mcp_server
+    import perplexity
+
+    # Every instagrapi Client the servers create is a fake one
+    client_pool.Client = FakeClient
+    # The MCP tools share the pooled client the HTTP login below creates
+    mcp_server.configure("bench", "bench")
+
+    backend = FakeClient.backend
+    threads = [t["thread_id"] for t in backend.threads]
+    usernames = [u["username"] for u in backend.users.values()]
+
+    results = []
+    transport = httpx.ASGITransport(app=http_server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as http:
+        login = await http.post("/api/login", json={"username": "bench", "password": "bench"})
+        token = login.json()["session_token"]
+        profiles = http_profiles(http, token, threads, usernames)
+        async with MCPClient(mcp_server.mcp_server) as mcp:
+            profiles.update(mcp_profiles(mcp, threads, usernames))
+            for name in args.profiles or list(profiles):
+                if name == "cold_start":
+                    continue
+                results.append(await drive(name, profiles[name], args.requests, args.concurrency))
+                print(format_row(results[-1]), flush=True)
+    await perplexity.aclose()
+    return results
+
+
+def format_row(row: Dict[str, Any]) -> str:
+    return (
+        f"{row['profile']:<24} n={row['requests']:<5} c={row['concurrency']:<3} err={row['errors']:<4} "
+        f"p50={row['p50_ms']:8.1f}ms p95={row['p95_ms']:8.1f}ms p99={row['p99_ms']:8.1f}ms "
+        f"{row['throughput_rps']:8.1f} req/s rss={row['rss_mb']:7.1f}MB"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-p", "--profile", dest="profiles", action="append",
+                        help="Profile to run (repeatable); default runs all of them.")
+    parser.add_argument("-n", "--requests", type=int, default=200)
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    parser.add_argument("--ig-latency", type=float, default=0.05, help="Seconds per fake Instagram call.")
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="Seconds per fake Perplexity completion.")
+    parser.add_argument("--cold-starts", type=int, default=5, help="Server starts measured by the cold_start profile.")
+    parser.add_argument("--output", help="Also write the results as JSON lines to this file.")
+    args = parser.parse_args()
+
+    FakeClient.latency = args.ig_latency
+    stub = FakePerplexity(latency=args.llm_latency).start()
+    # Must be set before the servers are imported
+    os.environ["PERPLEXITY_API_URL"] = stub.url
+    os.environ.setdefault("PERPLEXITY_API_KEY", "bench")
+    os.environ["JUSTRIZZ_DATA_DIR"] = tempfile.mkdtemp(prefix="justrizz-bench-")
+    try:
+        rows = []
+        if not args.profiles or "cold_start" in args.profiles:
+            rows.append(cold_start(args.cold_starts))
+            print(format_row(rows[-1]), flush=True)
+        if args.profiles != ["cold_start"]:
+            rows.extend(asyncio.run(main(args)))
+    finally:
+        stub.stop()
+    if args.output:
+        with open(args.output, "w") as f:
+            f.writelines(json.dumps(row) + "\n" for row in rows)
@@ -0,0 +1,183 @@
+import asyncio
+import hashlib
+import io
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from config import DATA_DIR
+from lookup_cache import TTLCache
+from metrics import register_cache, track_upstream
+
+THUMBNAIL_SIZE = 128
+WEBP_QUALITY = 80
+TIMEOUT = httpx.Timeout(connect=5.0, read=15.0, write=5.0, pool=5.0)
+LIMITS = httpx.Limits(max_connections=16, max_keepalive_connections=8, keepalive_expiry=60.0)
+
+
+class AvatarNotFound(Exception):
+    pass
+
+
+def _valid_pk(pk: str) -> bool:
+    # pks name files and glob patterns, so only plain digits are accepted
+    return pk.isascii() and pk.isdigit()
+
+
+class AvatarCache:
+    """Small WebP thumbnails of profile pictures, fetched once and kept on disk.
+
+    Instagram's CDN links are signed and expire, so listings only ever hand
+    out ``/api/avatar/{pk}`` and the latest known source URL is remembered
+    here. Thumbnails are named after the picture's URL path (the signature
+    lives in the query string), so a re-signed link reuses the stored file
+    while a new profile picture gets a new one and a new ETag. The directory
+    is kept under ``max_bytes`` by dropping the least recently served files.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int = 64 * 1024 * 1024, size: int = THUMBNAIL_SIZE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = size
+        self.sources = TTLCache(maxsize=16384, ttl=24 * 3600)  # pk -> profile_pic_url
+        self.hits = 0
+        self.misses = 0
+        self._bytes: Optional[int] = None
+        self._lock = threading.Lock()
+        self._fetches: Dict[str, asyncio.Future] = {}
+        self._http_client: Optional[httpx.AsyncClient] = None
+
+    @staticmethod
+    def version(url: str) -> str:
+        return hashlib.sha256(urlsplit(url).path.encode()).hexdigest()[:16]
+
+    def remember(self, pk: Any, url: Any) -> Optional[str]:
+        """Record ``url`` as the source for ``pk``; returns the thumbnail version, if any."""
+        if not pk or not url or not _valid_pk(str(pk)):
+            return None
+        url = str(url)
+        self.sources.set(str(pk), url)
+        return self.version(url)
+
+    def _path(self, pk: str, version: str) -> Path:
+        return self.directory / f"{pk}-{version}.webp"
+
+    def _latest_on_disk(self, pk: str) -> Optional[Path]:
+        candidates = list(self.directory.glob(f"{pk}-*.webp"))
+        return max(candidates, key=lambda p: p.stat().st_mtime) if candidates else None
+
+    def _thumbnail(self, data: bytes) -> bytes:
+        from PIL import Image
+
+        with Image.open(io.BytesIO(data)) as image:
+            image.draft("RGB", (self.size, self.size))  # cheap JPEG downscale while decoding
+            image = image.convert("RGB")
+            image.thumbnail((self.size, self.size), Image.LANCZOS)
+            out = io.BytesIO()
+            image.save(out, "WEBP", quality=WEBP_QUALITY, method=4)
+        return out.getvalue()
+
+    def _store(self, pk: str, path: Path, thumbnail: bytes):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(thumbnail)
+        os.replace(tmp, path)
+        with self._lock:
+            # Older pictures of the same account are never served again
+            removed = 0
+            for old in self.directory.glob(f"{pk}-*.webp"):
+                if old != path:
+                    try:
+                        removed += old.stat().st_size
+                        old.unlink()
+                    except FileNotFoundError:
+                        pass
+            if self._bytes is None:
+                self._bytes = sum(p.stat().st_size for p in self.directory.glob("*.webp"))
+            else:
+                self._bytes += len(thumbnail) - removed
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        files = sorted(self.directory.glob("*.webp"), key=lambda p: p.stat().st_mtime)
+        total = sum(p.stat().st_size for p in files)
+        # Go down to 90% so a full cache does not rescan on every insert
+        for path in files:
+            if total <= self.max_bytes * 0.9:
+                break
+            total -= path.stat().st_size
+            path.unlink(missing_ok=True)
+        self._bytes = total
+
+    def _read(self, path: Path) -> Optional[bytes]:
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        os.utime(path)  # mtime doubles as the LRU clock
+        return data
+
+    def get_http_client(self) -> httpx.AsyncClient:
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(timeout=TIMEOUT, limits=LIMITS, follow_redirects=True)
+        return self._http_client
+
+    async def aclose(self):
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+    async def _fetch(self, pk: str, url: str, path: Path) -> bytes:
+        with track_upstream("instagram.cdn.profile_pic"):
+            response = await self.get_http_client().get(url)
+        if response.status_code != 200:
+            raise AvatarNotFound(f"Profile picture for {pk} unavailable ({response.status_code}).")
+        thumbnail = await asyncio.to_thread(self._thumbnail, response.content)
+        await asyncio.to_thread(self._store, pk, path, thumbnail)
+        return thumbnail
+
+    async def get(self, pk: Any) -> Tuple[bytes, str]:
+        """Return ``(webp_bytes, version)`` for ``pk``, fetching the picture at most once."""
+        pk = str(pk)
+        if not _valid_pk(pk):
+            raise AvatarNotFound(f"No profile picture known for {pk}.")
+        url = self.sources.get(pk)
+        if url is None:
+            # Unknown source (e.g. after a restart): serve whatever is on disk
+            path = await asyncio.to_thread(self._latest_on_disk, pk)
+            if path is None:
+                raise AvatarNotFound(f"No profile picture known for {pk}.")
+        else:
+            path = self._path(pk, self.version(url))
+        version = path.stem.rsplit("-", 1)[1]
+        data = await asyncio.to_thread(self._read, path)
+        if data is not None:
+            self.hits += 1
+            return data, version
+        if url is None:
+            raise AvatarNotFound(f"No profile picture known for {pk}.")
+        self.misses += 1
+        key = path.name
+        future = self._fetches.get(key)
+        if future is None:
+            future = self._fetches[key] = asyncio.ensure_future(self._fetch(pk, url, path))
+            future.add_done_callback(lambda _: self._fetches.pop(key, None))
+        return await asyncio.shield(future), version
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        total = self.hits + self.misses
+        return {"thumbnails": {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "size": len(list(self.directory.glob("*.webp"))) if self.directory.exists() else 0,
+        }}
+
+
+avatar_cache = AvatarCache(DATA_DIR / "avatars")
+register_cache("avatar", avatar_cache.stats)
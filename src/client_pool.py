@@ -0,0 +1,119 @@
+import hashlib
+import hmac
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Optional, TypeVar
+
+if TYPE_CHECKING:
+    import instagrapi
+
+T = TypeVar("T")
+
+# instagrapi pulls in requests, Pillow, pycryptodomex and its pydantic models,
+# about a third of a second of imports, so it is loaded on first use. The
+# benchmark assigns a fake class here.
+Client = None
+
+
+def client_class():
+    global Client
+    if Client is None:
+        from instagrapi import Client as InstagrapiClient
+        Client = InstagrapiClient
+    return Client
+
+
+class ClientPool:
+    """Logged-in instagrapi clients keyed by Instagram username.
+
+    A pooled client is handed back as long as the caller presents the same
+    password it was created with. A full login only happens the first time an
+    account is seen or when Instagram reports the session as invalid, and the
+    session settings are flushed to disk on a background thread.
+    """
+
+    def __init__(self, settings_dir: Path = Path("."), max_clients: int = 64):
+        self.settings_dir = settings_dir
+        self.max_clients = max_clients
+        self._clients = OrderedDict()  # username -> (client, password digest)
+        self._lock = threading.Lock()
+        self._login_locks = {}
+        self._secret = os.urandom(32)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ig-settings")
+
+    def settings_path(self, username: str) -> Path:
+        return self.settings_dir / f"{username}_session.json"
+
+    def _digest(self, password: str) -> bytes:
+        return hmac.new(self._secret, password.encode(), hashlib.sha256).digest()
+
+    def _login_lock(self, username: str) -> threading.Lock:
+        with self._lock:
+            return self._login_locks.setdefault(username, threading.Lock())
+
+    def _lookup(self, username: str, digest: bytes) -> Optional["instagrapi.Client"]:
+        with self._lock:
+            entry = self._clients.get(username)
+            if entry is None or not hmac.compare_digest(entry[1], digest):
+                return None
+            self._clients.move_to_end(username)
+            return entry[0]
+
+    def _store(self, username: str, digest: bytes, client: "instagrapi.Client"):
+        with self._lock:
+            self._clients[username] = (client, digest)
+            self._clients.move_to_end(username)
+            while len(self._clients) > self.max_clients:
+                evicted, _ = self._clients.popitem(last=False)
+                self._login_locks.pop(evicted, None)
+
+    def _login(self, username: str, password: str, reuse_settings: bool = True) -> "instagrapi.Client":
+        client = client_class()()
+        settings_file = self.settings_path(username)
+        if reuse_settings and settings_file.exists():
+            client.load_settings(settings_file)
+        client.login(username, password)
+        return client
+
+    def get(self, username: str, password: str) -> "instagrapi.Client":
+        """Return an authenticated client for ``username``, logging in only if needed."""
+        digest = self._digest(password)
+        client = self._lookup(username, digest)
+        if client is not None:
+            return client
+        with self._login_lock(username):
+            client = self._lookup(username, digest)
+            if client is not None:
+                return client
+            client = self._login(username, password)
+            self._store(username, digest, client)
+        self.flush(username, client)
+        return client
+
+    def relogin(self, username: str, password: str) -> "instagrapi.Client":
+        """Drop the stored session for ``username`` and perform a fresh login."""
+        with self._login_lock(username):
+            client = self._login(username, password, reuse_settings=False)
+            self._store(username, self._digest(password), client)
+        self.flush(username, client)
+        return client
+
+    def call(self, username: str, password: str, fn: Callable[["instagrapi.Client"], T]) -> T:
+        """Run ``fn`` with a pooled client, re-logging in once if the session expired."""
+        from instagrapi.exceptions import LoginRequired
+
+        client = self.get(username, password)
+        try:
+            return fn(client)
+        except LoginRequired:
+            return fn(self.relogin(username, password))
+
+    def flush(self, username: str, client: "instagrapi.Client"):
+        """Persist ``client`` settings without blocking the caller."""
+        self._writer.submit(client.dump_settings, self.settings_path(username))
+
+
+client_pool = ClientPool()
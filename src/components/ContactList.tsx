@@ -6,6 +6,7 @@ import {
   fetchContacts,
   listPendingChats,
   searchThreads,
+  avatarUrl,
   listMessages,
   getThreadByParticipants,
 } from '@/lib/utils';
@@ -86,17 +87,21 @@ const ContactList: React.FC<ContactListProps> = ({ sessionToken, onContactSelect
       return;
     }
     setIsSearching(true);
-    searchThreads(searchQuery)
+    searchThreads(sessionToken, searchQuery, 'local')
       .then((res) => {
-        // Map search results to Contact[]
-        const mapped = (res.results || []).map((t: any) => ({
-          id: t.id,
-          username: t.users?.[0]?.username || '',
-          avatar: t.users?.[0]?.profile_pic_url || '',
-          lastChat: t.last_activity_at || '',
-          rizzScore: 60,
-          messageCount: t.items_count || t.thread_size || (t.messages?.length ?? 0),
-        }));
+        // Map thread summaries to Contact[], reusing what the contact listing already knows
+        const mapped = (res.results || []).map((t: any) => {
+          const user = t.users?.[0];
+          const known = contacts.find((c) => c.id === t.thread_id);
+          return {
+            id: t.thread_id,
+            username: user?.username || '',
+            avatar: known?.avatar || (user?.pk ? avatarUrl(user.pk) : ''),
+            lastChat: t.last_activity_at || '',
+            rizzScore: known?.rizzScore ?? 60,
+            messageCount: known?.messageCount ?? 0,
+          };
+        });
         setSearchResults(mapped);
         setFilteredContacts(mapped);
         setIsSearching(false);
@@ -106,7 +111,7 @@ const ContactList: React.FC<ContactListProps> = ({ sessionToken, onContactSelect
         setSearchResults([]);
         setFilteredContacts([]);
       });
-  }, [searchQuery, showPending, contacts, pendingChats]);
+  }, [sessionToken, searchQuery, showPending, contacts, pendingChats]);
 
   // Refresh button
   const handleRefresh = async () => {
@@ -130,7 +135,7 @@ const ContactList: React.FC<ContactListProps> = ({ sessionToken, onContactSelect
   const handleNewChatSearch = async () => {
     setIsNewChatSearching(true);
     try {
-      const res = await searchThreads(newChatQuery);
+      const res = await searchThreads(sessionToken, newChatQuery);
       setNewChatResults(res.results || []);
     } catch {
       setNewChatResults([]);
@@ -0,0 +1,22 @@
+import os
+from pathlib import Path
+
+# Load .env from the parent directory of this file (justRizz/instagram_dm_mcp)
+ENV_FILE = Path(__file__).resolve().parent.parent / ".env"
+if ENV_FILE.exists():
+    from dotenv import load_dotenv
+
+    load_dotenv(dotenv_path=ENV_FILE)
+
+# Local caches and stores live here; override with JUSTRIZZ_DATA_DIR.
+DATA_DIR = Path(os.getenv("JUSTRIZZ_DATA_DIR", ".justrizz"))
+
+
+def instagram_account():
+    """(username, password) the MCP tools act as, from JUSTRIZZ_IG_USERNAME / JUSTRIZZ_IG_PASSWORD."""
+    return os.getenv("JUSTRIZZ_IG_USERNAME"), os.getenv("JUSTRIZZ_IG_PASSWORD")
+
+
+def mcp_token():
+    """Bearer token guarding the MCP tools mounted in the HTTP backend (JUSTRIZZ_MCP_TOKEN); unset keeps them off."""
+    return os.getenv("JUSTRIZZ_MCP_TOKEN")
@@ -1,24 +1,115 @@
 # This file is now located in justRizz/instagram_dm_mcp/src/http_server.py
-# Usage: uvicorn instagram_dm_mcp.src.http_server:app --reload
+# Usage: python src/http_server.py [--reload]   (or: uvicorn http_server:app from src/)
 # Ensure your .env is in justRizz/instagram_dm_mcp or set environment variables for credentials.
 
+import time
+IMPORT_STARTED = time.perf_counter()
+
 import os
-from fastapi import FastAPI, HTTPException, Query, APIRouter
+import asyncio
+import hashlib
+import hmac
+import logging
+from urllib.parse import urlsplit
+from fastapi import FastAPI, HTTPException, Query, APIRouter, Request
+from fastapi.responses import PlainTextResponse, Response
+from fastapi.routing import APIRoute
 from pydantic import BaseModel
 from typing import List, Optional
-from instagrapi import Client
-from dotenv import load_dotenv
-import requests
-from uuid import uuid4
+from contextlib import asynccontextmanager, nullcontext
+from starlette.concurrency import run_in_threadpool
+from sse_starlette.sse import EventSourceResponse
 from fastapi.middleware.cors import CORSMiddleware
-import tempfile
+from starlette.datastructures import Headers
 import json
-from pathlib import Path
+import config
+from client_pool import client_class, client_pool
+from session_store import session_store
+from singleflight import guarded
+from lookup_cache import lookup_cache
+from line_cache import line_cache
+from avatar_cache import AvatarNotFound, avatar_cache
+from inbox_store import inbox_store_for
+from message_archive import ArchivePager, message_archive_for
+from pagination import pending_inbox_page
+from serialization import ORJSONResponse, fragment, loads, parse_fields, project, project_archived_thread, safe_val, stored, thread_summary
+import perplexity
+import prompt_builder
+import metrics
+from logger import get_logger, log_event
+
+log = get_logger("http")
+
+class BearerAuth:
+    """ASGI wrapper that only lets through requests carrying ``Authorization: Bearer <token>``."""
+
+    def __init__(self, app, token: str):
+        self.app = app
+        self.token = token.encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            scheme, _, presented = Headers(scope=scope).get("authorization", "").partition(" ")
+            if scheme.lower() != "bearer" or not hmac.compare_digest(presented.strip().encode(), self.token):
+                response = PlainTextResponse("Unauthorized", status_code=401, headers={"WWW-Authenticate": "Bearer"})
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+# The MCP tools over streamable HTTP at /mcp/, sharing this process's client pool
+# and caches. They act as the configured account without a session token, so
+# they are only served (and fastmcp only imported) when JUSTRIZZ_MCP_TOKEN is
+# set as well, and every request must present it.
+if config.mcp_token() and all(config.instagram_account()):
+    import mcp_server
+    mcp_app = mcp_server.mcp_server.http_app(path="/")
+else:
+    mcp_app = None
 
-# Load .env from the parent directory of this file (justRizz/instagram_dm_mcp)
-load_dotenv(dotenv_path=Path(__file__).resolve().parent.parent / ".env")
+startup_seconds = metrics.register_metric(metrics.Gauge(
+    "justrizz_startup_seconds", "Time to import the server, to be ready for requests, and to finish prewarming.", ("phase",)))
 
-app = FastAPI(title="Instagram DM HTTP Server")
+UPSTREAM_HOSTS = (urlsplit(perplexity.PERPLEXITY_API_URL).hostname, "i.instagram.com", "www.instagram.com")
+
+async def prewarm():
+    # Pay for what the first requests would otherwise wait on: DNS, TLS to
+    # Perplexity, the instagrapi import and clients for recently used sessions.
+    start = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    steps = {
+        "resolve": asyncio.gather(*(loop.getaddrinfo(host, 443) for host in UPSTREAM_HOSTS if host)),
+        "perplexity": perplexity.prewarm(),
+        "instagrapi": run_in_threadpool(client_class),
+        "sessions": run_in_threadpool(session_store.prewarm),
+    }
+    results = await asyncio.gather(*steps.values(), return_exceptions=True)
+    outcome = {
+        name: f"failed: {result}" if isinstance(result, BaseException) else "ok"
+        for name, result in zip(steps, results)
+    }
+    if not isinstance(results[-1], BaseException):
+        outcome["sessions"] = results[-1]
+    elapsed = time.perf_counter() - start
+    startup_seconds.set(elapsed, "prewarm")
+    log_event(log, logging.INFO, "prewarm", duration_ms=round(elapsed * 1000, 1), **outcome)
+
+def prewarm_enabled() -> bool:
+    return os.getenv("JUSTRIZZ_PREWARM", "1").lower() not in ("0", "false", "no")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with mcp_app.lifespan(mcp_app) if mcp_app is not None else nullcontext():
+        warmup = asyncio.create_task(prewarm()) if prewarm_enabled() else None
+        ready = time.perf_counter() - IMPORT_STARTED
+        startup_seconds.set(ready, "ready")
+        log_event(log, logging.INFO, "startup", import_ms=round(IMPORT_SECONDS * 1000, 1), ready_ms=round(ready * 1000, 1))
+        yield
+        if warmup is not None:
+            warmup.cancel()
+    await perplexity.aclose()
+    await avatar_cache.aclose()
+
+app = FastAPI(title="Instagram DM HTTP Server", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Enable CORS for development
 app.add_middleware(
@@ -27,12 +118,54 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
-router = APIRouter(prefix="/api")
+class InstrumentedRoute(APIRoute):
+    """Times every request and labels the upstream calls it makes with the route path."""
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        endpoint = self.path
 
-# In-memory session store (for demo; use persistent store for production)
-sessions = {}
+        async def instrumented(request):
+            token = metrics.current_endpoint.set(endpoint)
+            start = time.perf_counter()
+            status = 500
+            try:
+                response = await handler(request)
+                status = response.status_code
+                if status >= 400:
+                    metrics.request_errors.inc(endpoint)
+                return response
+            except Exception:
+                metrics.request_errors.inc(endpoint)
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                metrics.request_seconds.observe(elapsed, endpoint)
+                metrics.current_endpoint.reset(token)
+                log_event(log, logging.DEBUG, "request", method=request.method, endpoint=endpoint,
+                          status=status, duration_ms=round(elapsed * 1000, 2))
+
+        return instrumented
+
+router = APIRouter(prefix="/api", route_class=InstrumentedRoute)
+
+def etag_for(request: Request, version) -> str:
+    # Weak validator over the query string and a cheap version of the data behind the response
+    digest = hashlib.blake2b(repr((request.url.query, version)).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A 304 for ``etag`` if the client already has it, before anything is serialized."""
+    header = request.headers.get("if-none-match")
+    if header and (header.strip() == "*" or etag[2:] in (tag.strip().removeprefix("W/") for tag in header.split(","))):
+        return Response(status_code=304, headers=revalidate_headers(etag))
+    return None
+
+def revalidate_headers(etag: str):
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
 
 class SendMessageRequest(BaseModel):
     ig_username: str  # Instagram login username
@@ -54,6 +187,12 @@ class GetThreadDetailsRequest(BaseModel):
 class AnalyzeContactRequest(BaseModel):
     session_token: str
     username: str
+    force_refresh: bool = False  # Bypass the pickup line cache and regenerate
+
+class AnalyzeContactsRequest(BaseModel):
+    session_token: str
+    usernames: List[str]  # Contacts with an open thread, as returned by list_contacts
+    force_refresh: bool = False
 
 class LoginRequest(BaseModel):
     username: str
@@ -61,34 +200,32 @@ class LoginRequest(BaseModel):
 
 @router.post("/login")
 def login(req: LoginRequest):
-    client = Client()
     try:
-        client.login(req.username, req.password)
-        session_token = str(uuid4())
-        sessions[session_token] = client
+        client = client_pool.get(req.username, req.password)
+        session_token = session_store.create(client, req.username)
         return {"success": True, "session_token": session_token}
     except Exception as e:
         return {"success": False, "message": str(e)}
 
 def get_client(session_token: str):
-    client = sessions.get(session_token)
+    # May rehydrate a session from disk (and import instagrapi), so async handlers call it in the threadpool
+    client = session_store.get(session_token)
     if not client:
         raise HTTPException(status_code=401, detail="Invalid or expired session token. Please log in again.")
-    return client
+    return guarded(client)
 
 @router.post("/send_message")
 def send_message(req: SendMessageRequest):
-    client = Client()
-    SESSION_FILE = Path(f"{req.ig_username}_session.json")
-    try:
-        if SESSION_FILE.exists():
-            client.load_settings(SESSION_FILE)
-        client.login(req.ig_username, req.ig_password)
-        client.dump_settings(SESSION_FILE)
-        user_id = client.user_id_from_username(req.username)
+    def send(client):
+        client = guarded(client)
+        user_id = lookup_cache.user_id_from_username(client, req.username)
         if not user_id:
+            return None, False
+        return client.direct_send(req.message, [user_id]), True
+    try:
+        dm, found = client_pool.call(req.ig_username, req.ig_password, send)
+        if not found:
             return {"success": False, "message": f"User '{req.username}' not found."}
-        dm = client.direct_send(req.message, [user_id])
         if dm:
             return {"success": True, "message": "Message sent to user.", "direct_message_id": getattr(dm, 'id', None)}
         else:
@@ -97,64 +234,77 @@ def send_message(req: SendMessageRequest):
         return {"success": False, "message": str(e)}
 
 @router.get("/list_chats")
-def list_chats(session_token: str = Query(...), amount: int = 20, selected_filter: str = "", thread_message_limit: Optional[int] = None, full: bool = False, fields: Optional[str] = None):
+def list_chats(request: Request, session_token: str = Query(...), amount: int = 20, selected_filter: str = "", thread_message_limit: Optional[int] = None, full: bool = False, fields: Optional[str] = None, refresh: bool = False):
     client = get_client(session_token)
-    def thread_summary(thread):
-        t = thread if isinstance(thread, dict) else thread.dict()
-        users = t.get("users", [])
-        user_summaries = [
-            {"username": u.get("username"), "full_name": u.get("full_name"), "pk": u.get("pk")} for u in users
-        ]
-        return {
-            "thread_id": t.get("id"),
-            "thread_title": t.get("thread_title"),
-            "users": user_summaries,
-            "last_activity_at": t.get("last_activity_at"),
-            "last_message": t.get("messages", [{}])[-1] if t.get("messages") else None
-        }
-    def filter_fields(thread, fields):
-        t = thread if isinstance(thread, dict) else thread.dict()
-        return {field: t.get(field) for field in fields}
     try:
-        threads = client.direct_threads(amount, selected_filter, thread_message_limit)
+        if selected_filter:
+            threads = client.direct_threads(amount, selected_filter, thread_message_limit=thread_message_limit)
+            etag = etag_for(request, [(t.id, t.last_activity_at) for t in threads])
+        else:
+            # The unfiltered inbox is served from the local mirror after a delta sync
+            store = inbox_store_for(client)
+            store.sync(client, amount=amount, thread_message_limit=thread_message_limit, full=refresh)
+            etag = etag_for(request, [row[:3] for row in store.versions(limit=amount)])
+            threads = None
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+        if threads is None:
+            threads = store.threads(limit=amount, message_limit=thread_message_limit)
+        field_list = parse_fields(fields)
+        headers = revalidate_headers(etag)
         if full:
-            return {"success": True, "threads": [t.dict() if hasattr(t, 'dict') else str(t) for t in threads]}
-        elif fields:
-            field_list = [f.strip() for f in fields.split(",") if f.strip()]
-            return {"success": True, "threads": [filter_fields(t, field_list) for t in threads]}
+            return ORJSONResponse({"success": True, "threads": [fragment(t) for t in threads]}, headers=headers)
+        elif field_list:
+            return ORJSONResponse({"success": True, "threads": [project(t, field_list) for t in threads]}, headers=headers)
         else:
-            return {"success": True, "threads": [thread_summary(t) for t in threads]}
+            return ORJSONResponse({"success": True, "threads": [thread_summary(t, fragment) for t in threads]}, headers=headers)
     except Exception as e:
         return {"success": False, "message": str(e)}
 
 @router.get("/list_messages")
-def list_messages(session_token: str = Query(...), thread_id: str = Query(...), amount: int = 20):
+def list_messages(session_token: str = Query(...), thread_id: str = Query(...), amount: int = 20, cursor: Optional[str] = None, fields: Optional[str] = None):
     client = get_client(session_token)
     if not thread_id:
         raise HTTPException(status_code=400, detail="Thread ID must be provided.")
+    if amount < 1:
+        raise HTTPException(status_code=400, detail="amount must be at least 1.")
     try:
-        messages = client.direct_messages(thread_id, amount)
-        return {"success": True, "messages": [m.dict() if hasattr(m, 'dict') else str(m) for m in messages]}
+        pager = ArchivePager(client, message_archive_for(client), thread_id, amount)
+        messages, next_cursor = pager.messages(cursor)
+        inbox_store_for(client).index_messages(thread_id, pager.fresh)
+        field_list = parse_fields(fields)
+        if field_list:
+            return ORJSONResponse({"success": True, "messages": [project(loads(m), field_list) for m in messages], "next_cursor": next_cursor})
+        return ORJSONResponse({"success": True, "messages": [stored(m) for m in messages], "next_cursor": next_cursor})
     except Exception as e:
         return {"success": False, "message": str(e)}
 
 @router.get("/list_pending_chats")
-def list_pending_chats(session_token: str = Query(...), amount: int = 20):
+def list_pending_chats(session_token: str = Query(...), amount: int = 20, cursor: Optional[str] = None, fields: Optional[str] = None):
     client = get_client(session_token)
     try:
-        threads = client.direct_pending_inbox(amount)
-        return {"success": True, "threads": [t.dict() if hasattr(t, 'dict') else str(t) for t in threads]}
+        threads, next_cursor = pending_inbox_page(client, amount, cursor)
+        field_list = parse_fields(fields)
+        if field_list:
+            return ORJSONResponse({"success": True, "threads": [project(t, field_list) for t in threads], "next_cursor": next_cursor})
+        return ORJSONResponse({"success": True, "threads": [fragment(t) for t in threads], "next_cursor": next_cursor})
     except Exception as e:
         return {"success": False, "message": str(e)}
 
 @router.get("/search_threads")
-def search_threads(session_token: str = Query(...), query: str = Query(...)):
+def search_threads(session_token: str = Query(...), query: str = Query(...), source: str = "remote", limit: int = 20):
     client = get_client(session_token)
     if not query:
         raise HTTPException(status_code=400, detail="Query must be provided.")
+    if source not in ("local", "remote"):
+        raise HTTPException(status_code=400, detail="source must be 'local' or 'remote'.")
     try:
+        if source == "local":
+            # Prefix search over the local inbox mirror, suitable for type-ahead
+            return ORJSONResponse({"success": True, "results": inbox_store_for(client).search(query, limit)})
         results = client.direct_search(query)
-        return {"success": True, "results": [r.dict() if hasattr(r, 'dict') else str(r) for r in results]}
+        return ORJSONResponse({"success": True, "results": [fragment(r) for r in results]})
     except Exception as e:
         return {"success": False, "message": str(e)}
 
@@ -165,18 +315,27 @@ def get_thread_by_participants(session_token: str = Query(...), req: GetThreadBy
         raise HTTPException(status_code=400, detail="user_ids must be a non-empty list of user IDs.")
     try:
         thread = client.direct_thread_by_participants(req.user_ids)
-        return {"success": True, "thread": thread.dict() if hasattr(thread, 'dict') else str(thread)}
+        return ORJSONResponse({"success": True, "thread": fragment(thread)})
     except Exception as e:
         return {"success": False, "message": str(e)}
 
 @router.get("/get_thread_details")
-def get_thread_details(session_token: str = Query(...), thread_id: str = Query(...), amount: int = 20):
+def get_thread_details(request: Request, session_token: str = Query(...), thread_id: str = Query(...), amount: int = 20, cursor: Optional[str] = None, fields: Optional[str] = None, message_fields: Optional[str] = None):
     client = get_client(session_token)
     if not thread_id:
         raise HTTPException(status_code=400, detail="Thread ID must be provided.")
+    if amount < 1:
+        raise HTTPException(status_code=400, detail="amount must be at least 1.")
     try:
-        thread = client.direct_thread(thread_id, amount)
-        return {"success": True, "thread": thread.dict() if hasattr(thread, 'dict') else str(thread)}
+        pager = ArchivePager(client, message_archive_for(client), thread_id, amount)
+        thread, messages, next_cursor = pager.thread(cursor)
+        inbox_store_for(client).index_messages(thread_id, pager.fresh)
+        etag = etag_for(request, (thread.id, thread.last_activity_at, pager.ids, next_cursor))
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
+        thread_body = project_archived_thread(thread, messages, parse_fields(fields), parse_fields(message_fields), stored)
+        return ORJSONResponse({"success": True, "thread": thread_body, "next_cursor": next_cursor}, headers=revalidate_headers(etag))
     except Exception as e:
         return {"success": False, "message": str(e)}
 
@@ -186,7 +345,7 @@ def get_user_id_from_username(session_token: str = Query(...), username: str = Q
     if not username:
         raise HTTPException(status_code=400, detail="Username must be provided.")
     try:
-        user_id = client.user_id_from_username(username)
+        user_id = lookup_cache.user_id_from_username(client, username)
         if user_id:
             return {"success": True, "user_id": user_id}
         else:
@@ -200,7 +359,7 @@ def get_username_from_user_id(session_token: str = Query(...), user_id: str = Qu
     if not user_id:
         raise HTTPException(status_code=400, detail="User ID must be provided.")
     try:
-        username = client.username_from_user_id(user_id)
+        username = lookup_cache.username_from_user_id(client, user_id)
         if username:
             return {"success": True, "username": username}
         else:
@@ -208,99 +367,221 @@ def get_username_from_user_id(session_token: str = Query(...), user_id: str = Qu
     except Exception as e:
         return {"success": False, "message": str(e)}
 
-PERPLEXITY_API_KEY = os.getenv("PERPLEXITY_API_KEY")
+def extract_profile_details(user_info):
+    # Only include serializable fields
+    return {
+        "username": safe_val(getattr(user_info, "username", "")),
+        "full_name": safe_val(getattr(user_info, "full_name", "")),
+        "bio": safe_val(getattr(user_info, "biography", "")),
+        "profile_pic_url": safe_val(getattr(user_info, "profile_pic_url", "")),
+        "followers": safe_val(getattr(user_info, "follower_count", 0)),
+        "following": safe_val(getattr(user_info, "following_count", 0)),
+        "posts": safe_val(getattr(user_info, "media_count", 0)),
+        "is_private": safe_val(getattr(user_info, "is_private", False)),
+        "is_verified": safe_val(getattr(user_info, "is_verified", False)),
+    }
+
+def fetch_profile_details(client, username: str):
+    # Fetch user profile details with safe defaults
+    details = lookup_cache.profile_details(client, username, extract_profile_details)
+    if not details["username"]:
+        details = dict(details, username=username)
+    return details
+
+def avatar_url(request: Request, pk, url) -> str:
+    # Serve profile pictures through the thumbnail cache instead of expiring CDN links
+    version = avatar_cache.remember(pk, url)
+    if version is None:
+        return url
+    return f"{request.url_for('avatar', pk=str(pk))}?v={version}"
+
+def public_profile(request: Request, profile_details):
+    pk = lookup_cache.user_ids.get(profile_details["username"].lower())
+    return dict(profile_details, profile_pic_url=avatar_url(request, pk, profile_details["profile_pic_url"]))
+
+async def generate_pickup_lines(client, request: Request, username: str, force_refresh: bool = False):
+    # Profile lookup, line cache and one Perplexity completion; never sends anything
+    profile_details = await run_in_threadpool(fetch_profile_details, client, username)
+    profile = public_profile(request, profile_details)
+    prompt = prompt_builder.build(profile_details, username)
+    cache_key = line_cache.key(prompt.cache_profile, prompt.model, prompt.template_version)
+    cached = None if force_refresh else await run_in_threadpool(line_cache.get, cache_key)
+    if cached:
+        return {"success": True, "pickup_lines": cached, "profile": profile, "cached": True}
+    pickup_line = await perplexity.complete(prompt.messages, prompt.model)
+    if not pickup_line:
+        backend_response = {"success": False, "message": "AI did not return a pickup line.", "profile": profile, "prompt_tokens": prompt.tokens}
+        log_event(log, logging.WARNING, "analyze_contact.empty_completion", username=username)
+        log_event(log, logging.DEBUG, "analyze_contact.response", response=backend_response)
+        return backend_response
+    await run_in_threadpool(line_cache.put, cache_key, [pickup_line], prompt.model, prompt.template_version)
+    backend_response = {"success": True, "pickup_lines": [pickup_line], "profile": profile, "cached": False, "prompt_tokens": prompt.tokens}
+    log_event(log, logging.DEBUG, "analyze_contact.response", response=backend_response)
+    return backend_response
 
 @router.post("/analyze_contact")
-def analyze_contact(req: AnalyzeContactRequest):
-    client = get_client(req.session_token)
+async def analyze_contact(req: AnalyzeContactRequest, request: Request):
+    client = await run_in_threadpool(get_client, req.session_token)
     try:
-        # Fetch user profile details with safe defaults
-        user_id = client.user_id_from_username(req.username)
-        user_info = client.user_info(user_id)
-        # Only include serializable fields
-        def safe_val(val):
-            if isinstance(val, (str, int, bool, float, type(None))):
-                return val
-            return str(val)
-        profile_details = {
-            "username": safe_val(getattr(user_info, "username", req.username)),
-            "full_name": safe_val(getattr(user_info, "full_name", "")),
-            "bio": safe_val(getattr(user_info, "biography", "")),
-            "profile_pic_url": safe_val(getattr(user_info, "profile_pic_url", "")),
-            "followers": safe_val(getattr(user_info, "follower_count", 0)),
-            "following": safe_val(getattr(user_info, "following_count", 0)),
-            "posts": safe_val(getattr(user_info, "media_count", 0)),
-            "is_private": safe_val(getattr(user_info, "is_private", False)),
-            "is_verified": safe_val(getattr(user_info, "is_verified", False)),
-        }
-        # Serialize details to JSON string (in memory)
-        profile_text = json.dumps(profile_details, indent=2)
-        # Prepare prompt for AI
-        prompt = (
-            f"Given the following Instagram profile details in JSON format:\n{profile_text}\n"
-            f"Generate a creative, friendly, and context-aware pickup line for the user to send to {req.username}. "
-            f"Only return the pickup line and nothing else. Do not include any explanation or extra text."
-        )
-        url = "https://api.perplexity.ai/chat/completions"
-        headers = {
-            "accept": "application/json",
-            "content-type": "application/json",
-            "Authorization": f"Bearer {PERPLEXITY_API_KEY}"
-        }
-        data = {
-            "model": "sonar-pro",
-            "messages": [
-                {"role": "system", "content": "You are an assistant that ONLY returns the pickup line and nothing else. Do not include any explanation, greeting, or extra text."},
-                {"role": "user", "content": prompt}
-            ]
-        }
-        response = requests.post(url, headers=headers, json=data)
-        if response.status_code != 200:
-            print("Perplexity API error response:", response.text)
-            raise Exception(f"Perplexity API error: {response.text}")
-        result = response.json()
-        print("Perplexity API response:", result)
-        pickup_line = result.get("choices", [{}])[0].get("message", {}).get("content", "").strip()
-        if not pickup_line:
-            backend_response = {"success": False, "message": "AI did not return a pickup line.", "profile": profile_details}
-            print("Backend response:", backend_response)
-            return backend_response
-        backend_response = {"success": True, "pickup_lines": [pickup_line], "profile": profile_details}
-        print("Backend response:", backend_response)
-        return backend_response
+        return await generate_pickup_lines(client, request, req.username, req.force_refresh)
     except Exception as e:
-        backend_response = {"success": False, "message": str(e)}
-        print("Backend response:", backend_response)
-        return backend_response
+        log_event(log, logging.WARNING, "analyze_contact.failed", username=req.username, error=str(e))
+        return {"success": False, "message": str(e)}
+
+# Concurrent profile fetches + completions per /analyze_contacts call
+ANALYZE_CONCURRENCY = 4
+MAX_BATCH = 50
+
+@router.post("/analyze_contacts")
+async def analyze_contacts(req: AnalyzeContactsRequest, request: Request):
+    """Server-sent events: one ``result`` per contact as it completes, then ``done``.
+
+    Only contacts with an open thread in the inbox mirror (see list_contacts)
+    are analyzed. Lines are generated, never sent.
+    """
+    client = await run_in_threadpool(get_client, req.session_token)
+    usernames = list(dict.fromkeys(u for u in req.usernames if u))
+    if not usernames:
+        raise HTTPException(status_code=400, detail="usernames must be a non-empty list.")
+    if len(usernames) > MAX_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH} usernames per call.")
+    store = inbox_store_for(client)
+    await run_in_threadpool(store.sync, client, 50)
+    known = await run_in_threadpool(store.participants, usernames)
+    semaphore = asyncio.Semaphore(ANALYZE_CONCURRENCY)
+
+    async def analyze_one(username: str):
+        if username.lower() not in known:
+            return {"username": username, "success": False, "message": f"No open thread with '{username}'."}
+        async with semaphore:
+            try:
+                return dict(await generate_pickup_lines(client, request, username, req.force_refresh), username=username)
+            except Exception as e:
+                log_event(log, logging.WARNING, "analyze_contacts.failed", username=username, error=str(e))
+                return {"username": username, "success": False, "message": str(e)}
+
+    async def events():
+        metrics.current_endpoint.set("/api/analyze_contacts")
+        tasks = [asyncio.ensure_future(analyze_one(username)) for username in usernames]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield {"event": "result", "data": json.dumps(await next_result)}
+            yield {"event": "done", "data": json.dumps({"success": True, "count": len(tasks)})}
+        finally:
+            # Client went away: stop the remaining lookups and completions
+            for task in tasks:
+                task.cancel()
+    return EventSourceResponse(events())
+
+@router.post("/analyze_contact/stream")
+async def analyze_contact_stream(req: AnalyzeContactRequest, request: Request):
+    """Server-sent events: ``profile``, then one ``token`` per delta, then ``done`` or ``error``."""
+    client = await run_in_threadpool(get_client, req.session_token)
+    async def events():
+        # The body streams after the route handler returned, so label it here
+        metrics.current_endpoint.set("/api/analyze_contact/stream")
+        try:
+            profile_details = await run_in_threadpool(fetch_profile_details, client, req.username)
+            profile = public_profile(request, profile_details)
+            yield {"event": "profile", "data": json.dumps(profile)}
+            prompt = prompt_builder.build(profile_details, req.username)
+            cache_key = line_cache.key(prompt.cache_profile, prompt.model, prompt.template_version)
+            cached = None if req.force_refresh else await run_in_threadpool(line_cache.get, cache_key)
+            if cached:
+                yield {"event": "done", "data": json.dumps({"success": True, "pickup_lines": cached, "profile": profile, "cached": True})}
+                return
+            parts = []
+            async for token in perplexity.stream(prompt.messages, prompt.model):
+                parts.append(token)
+                yield {"event": "token", "data": json.dumps({"token": token})}
+            pickup_line = "".join(parts).strip()
+            if not pickup_line:
+                yield {"event": "error", "data": json.dumps({"success": False, "message": "AI did not return a pickup line."})}
+                return
+            await run_in_threadpool(line_cache.put, cache_key, [pickup_line], prompt.model, prompt.template_version)
+            yield {"event": "done", "data": json.dumps({"success": True, "pickup_lines": [pickup_line], "profile": profile, "cached": False, "prompt_tokens": prompt.tokens})}
+        except Exception as e:
+            log_event(log, logging.WARNING, "analyze_contact_stream.failed", username=req.username, error=str(e))
+            yield {"event": "error", "data": json.dumps({"success": False, "message": str(e)})}
+    return EventSourceResponse(events())
 
 @router.get("/list_contacts")
-def list_contacts(session_token: str = Query(...)):
+def list_contacts(request: Request, session_token: str = Query(...), refresh: bool = False, sort: str = "recent"):
     client = get_client(session_token)
+    if sort not in ("recent", "rizz"):
+        raise HTTPException(status_code=400, detail="sort must be 'recent' or 'rizz'.")
     try:
-        # Get DM threads (inbox)
-        threads = client.direct_threads(amount=50)
+        # Get DM threads (inbox) from the local mirror, syncing only what changed
+        store = inbox_store_for(client)
+        store.sync(client, amount=50, full=refresh)
+        etag = etag_for(request, store.versions(limit=50, order=sort))
+        cached = not_modified(request, etag)
+        if cached:
+            return cached
         contacts = []
-        for thread in threads:
+        for thread, rizz_score in store.scored_threads(limit=50, order=sort):
             # Get the other user (not self)
-            users = [u for u in thread.users if u.pk != client.user_id]
+            users = [u for u in thread["users"] if str(u["pk"]) != str(client.user_id)]
             if not users:
                 continue
             user = users[0]
+            lookup_cache.remember(user["username"], user["pk"])
             contacts.append({
-                "id": thread.id,
-                "username": user.username,
-                "avatar": user.profile_pic_url,
-                "lastChat": thread.last_activity_at,
-                "rizzScore": 0,
+                "id": thread["id"],
+                "username": user["username"],
+                "avatar": avatar_url(request, user["pk"], user["profile_pic_url"]),
+                "lastChat": thread["last_activity_at"],
+                "rizzScore": rizz_score,
             })
-        return {"success": True, "contacts": contacts}
+        return ORJSONResponse({"success": True, "contacts": contacts}, headers=revalidate_headers(etag))
     except Exception as e:
         return {"success": False, "message": str(e)}
 
+@router.get("/avatar/{pk}", name="avatar")
+async def avatar(pk: str, request: Request):
+    """WebP thumbnail of a profile picture seen in an earlier listing, with ETag revalidation."""
+    try:
+        data, version = await avatar_cache.get(pk)
+    except AvatarNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    etag = f'"{version}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=86400"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(data, media_type="image/webp", headers=headers)
+
 app.include_router(router)
+if mcp_app is not None:
+    app.mount("/mcp", BearerAuth(mcp_app, config.mcp_token()))
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return metrics.render()
+
+@app.get("/debug/profile", response_class=PlainTextResponse)
+async def debug_profile(seconds: float = Query(10.0, gt=0, le=120), hz: float = Query(100.0, gt=0, le=1000)):
+    """Sample all threads for ``seconds`` and return collapsed stacks (JUSTRIZZ_PROFILER=1 only)."""
+    if not metrics.profiler_enabled():
+        raise HTTPException(status_code=404, detail="Not Found")
+    profiler = metrics.SamplingProfiler(hz).start()
+    await asyncio.sleep(seconds)
+    return await run_in_threadpool(profiler.stop)
+
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED
+startup_seconds.set(IMPORT_SECONDS, "import")
 
 if __name__ == "__main__":
+    import argparse
     import uvicorn
-    import os
-    port = int(os.environ.get("PORT", 8000))
-    uvicorn.run("http_server:app", host="0.0.0.0", port=port, reload=True) 
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8000)))
+    parser.add_argument("--reload", action="store_true", help="Development mode: restart on code changes.")
+    args = parser.parse_args()
+    if args.reload:
+        uvicorn.run("http_server:app", host=args.host, port=args.port, reload=True)
+    else:
+        # Serve this module's app directly instead of importing it a second time as http_server
+        uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,332 @@
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import rizz_score
+from config import DATA_DIR
+from serialization import loads, thread_summary
+
+
+def _timestamp(value) -> float:
+    return value.timestamp() if value is not None else 0.0
+
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def fts_query(text: str) -> Optional[str]:
+    """Turn free text into an FTS5 query that prefix-matches every word."""
+    tokens = _TOKEN_RE.findall(text)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+class InboxStore:
+    """Local SQLite mirror of one account's DM inbox.
+
+    Threads are stored keyed by ``thread_id`` with their ``last_activity_at``
+    and the ``thread_message_limit`` they were fetched with (0 for Instagram's
+    default). ``sync`` walks the inbox newest-first with instagrapi's cursor
+    and stops as soon as it reaches threads the mirror already has, so a
+    refresh only pays for what changed since the previous one; asking for
+    more messages per thread than are stored refetches the newest threads.
+    The message-history part of each thread's rizzScore is stored next to it
+    and recomputed on the same changes.
+    """
+
+    def __init__(self, path: Path, user_id: Optional[str] = None):
+        self.path = path
+        self.user_id = user_id
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._conn = None
+        self.last_sync = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS threads (
+                    thread_id TEXT PRIMARY KEY,
+                    thread_title TEXT,
+                    last_activity_at REAL NOT NULL,
+                    message_limit INTEGER NOT NULL DEFAULT 0,
+                    data TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS threads_by_activity ON threads (last_activity_at DESC);
+                CREATE TABLE IF NOT EXISTS participants (
+                    thread_id TEXT NOT NULL,
+                    pk TEXT NOT NULL,
+                    username TEXT,
+                    full_name TEXT,
+                    profile_pic_url TEXT,
+                    PRIMARY KEY (thread_id, pk)
+                );
+                CREATE VIRTUAL TABLE IF NOT EXISTS thread_search USING fts5(
+                    thread_id UNINDEXED, title, participants,
+                    tokenize = "unicode61 remove_diacritics 2", prefix = '2 3'
+                );
+                CREATE VIRTUAL TABLE IF NOT EXISTS message_search USING fts5(
+                    thread_id UNINDEXED, message_id UNINDEXED, text,
+                    tokenize = "unicode61 remove_diacritics 2", prefix = '2 3'
+                );
+                CREATE TABLE IF NOT EXISTS indexed_messages (message_id TEXT PRIMARY KEY);
+                CREATE TABLE IF NOT EXISTS scores (
+                    thread_id TEXT PRIMARY KEY,
+                    reply REAL NOT NULL,
+                    ratio REAL NOT NULL,
+                    version INTEGER NOT NULL
+                );
+                """
+            )
+            if "message_limit" not in {row[1] for row in conn.execute("PRAGMA table_info(threads)")}:
+                # Mirrors created before the message limit was stored
+                conn.execute("ALTER TABLE threads ADD COLUMN message_limit INTEGER NOT NULL DEFAULT 0")
+            conn.create_function("rizz_score", 4, rizz_score.score, deterministic=True)
+            self._rescore(conn)
+            self._conn = conn
+        return self._conn
+
+    def _score(self, conn: sqlite3.Connection, thread_id: str, thread):
+        reply, ratio = rizz_score.components(thread, self.user_id)
+        conn.execute(
+            "INSERT OR REPLACE INTO scores (thread_id, reply, ratio, version) VALUES (?, ?, ?, ?)",
+            (thread_id, reply, ratio, rizz_score.VERSION),
+        )
+
+    def _rescore(self, conn: sqlite3.Connection):
+        # Threads mirrored before scoring existed, or scored by an older version
+        stale = conn.execute(
+            "SELECT t.thread_id, t.data FROM threads t LEFT JOIN scores s USING (thread_id)"
+            " WHERE s.version IS NULL OR s.version != ?",
+            (rizz_score.VERSION,),
+        ).fetchall()
+        for thread_id, data in stale:
+            self._score(conn, thread_id, loads(data))
+        conn.commit()
+
+    def high_water(self) -> float:
+        with self._lock:
+            row = self._connect().execute("SELECT MAX(last_activity_at) FROM threads").fetchone()
+        return row[0] or 0.0
+
+    def count(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM threads").fetchone()[0]
+
+    def message_limit(self, amount: int) -> int:
+        """The smallest ``thread_message_limit`` among the newest ``amount`` stored threads."""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT MIN(message_limit) FROM (SELECT message_limit FROM threads ORDER BY last_activity_at DESC LIMIT ?)",
+                (amount,),
+            ).fetchone()
+        return row[0] or 0
+
+    def upsert(self, threads, message_limit: int = 0) -> List[str]:
+        """Store ``threads`` and return the ids that changed.
+
+        A thread changed if its ``last_activity_at`` moved or it was fetched
+        with more messages (``message_limit``) than the stored copy.
+        """
+        changed = []
+        with self._lock:
+            conn = self._connect()
+            known = {thread_id: (activity, limit) for thread_id, activity, limit in conn.execute(
+                f"SELECT thread_id, last_activity_at, message_limit FROM threads WHERE thread_id IN ({','.join('?' * len(threads))})",
+                [str(t.id) for t in threads],
+            ).fetchall()} if threads else {}
+            for thread in threads:
+                thread_id = str(thread.id)
+                activity = _timestamp(thread.last_activity_at)
+                stored_activity, stored_limit = known.get(thread_id, (None, 0))
+                if stored_activity == activity and stored_limit >= message_limit:
+                    continue
+                changed.append(thread_id)
+                conn.execute(
+                    "INSERT OR REPLACE INTO threads (thread_id, thread_title, last_activity_at, message_limit, data) VALUES (?, ?, ?, ?, ?)",
+                    (thread_id, thread.thread_title, activity, message_limit, thread.model_dump_json()),
+                )
+                conn.execute("DELETE FROM participants WHERE thread_id = ?", (thread_id,))
+                conn.executemany(
+                    "INSERT OR REPLACE INTO participants (thread_id, pk, username, full_name, profile_pic_url) VALUES (?, ?, ?, ?, ?)",
+                    [(thread_id, str(u.pk), u.username, u.full_name, str(u.profile_pic_url or "")) for u in thread.users],
+                )
+                conn.execute("DELETE FROM thread_search WHERE thread_id = ?", (thread_id,))
+                conn.execute(
+                    "INSERT INTO thread_search (thread_id, title, participants) VALUES (?, ?, ?)",
+                    (thread_id, thread.thread_title or "",
+                     " ".join(f"{u.username or ''} {u.full_name or ''}" for u in thread.users)),
+                )
+                self._index_messages(conn, thread_id, thread.messages)
+                self._score(conn, thread_id, thread)
+            conn.commit()
+        return changed
+
+    def _index_messages(self, conn: sqlite3.Connection, thread_id: str, messages):
+        rows = [(str(m.id), m.text) for m in messages if m.id and m.text]
+        if not rows:
+            return
+        seen = {row[0] for row in conn.execute(
+            f"SELECT message_id FROM indexed_messages WHERE message_id IN ({','.join('?' * len(rows))})",
+            [row[0] for row in rows],
+        )}
+        fresh = [row for row in rows if row[0] not in seen]
+        conn.executemany("INSERT OR IGNORE INTO indexed_messages (message_id) VALUES (?)", [(row[0],) for row in fresh])
+        conn.executemany(
+            "INSERT INTO message_search (thread_id, message_id, text) VALUES (?, ?, ?)",
+            [(thread_id, message_id, text) for message_id, text in fresh],
+        )
+
+    def index_messages(self, thread_id: str, messages):
+        """Add message text pulled through direct_messages / direct_thread to the search index."""
+        with self._lock:
+            conn = self._connect()
+            self._index_messages(conn, str(thread_id), messages)
+            conn.commit()
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Prefix search over thread titles, participants and indexed message text.
+
+        Thread-level matches rank ahead of message matches; each result is a
+        ``thread_summary`` of the stored thread (small enough for type-ahead)
+        plus the ``snippet`` of the best matching message, if any.
+        """
+        match = fts_query(query)
+        if match is None:
+            return []
+        with self._lock:
+            conn = self._connect()
+            hits = conn.execute(
+                "SELECT thread_id, NULL FROM thread_search WHERE thread_search MATCH ? ORDER BY rank LIMIT ?",
+                (match, limit),
+            ).fetchall()
+            hits += conn.execute(
+                "SELECT thread_id, snippet(message_search, 2, '', '', '…', 12) FROM message_search"
+                " WHERE message_search MATCH ? ORDER BY rank LIMIT ?",
+                (match, limit),
+            ).fetchall()
+            results = {}
+            for thread_id, snippet in hits:
+                if thread_id in results or len(results) >= limit:
+                    continue
+                row = conn.execute("SELECT data FROM threads WHERE thread_id = ?", (thread_id,)).fetchone()
+                if row:
+                    results[thread_id] = dict(thread_summary(loads(row[0])), snippet=snippet)
+        return list(results.values())
+
+    def sync(self, client, amount: int = 50, thread_message_limit: Optional[int] = None,
+             min_interval: float = 5.0, full: bool = False) -> List[str]:
+        """Fetch threads newer than the stored high-water mark.
+
+        Paging continues past the mark only while the mirror holds fewer than
+        ``amount`` threads; ``full`` ignores the mark and refetches the newest
+        ``amount``, as does asking for a larger ``thread_message_limit`` than
+        those threads were stored with. Returns the ids of threads that changed.
+        """
+        message_limit = thread_message_limit or 0
+        with self._sync_lock:
+            if message_limit > self.message_limit(amount):
+                full = True
+            if not full and time.monotonic() - self.last_sync < min_interval and self.count() >= amount:
+                return []
+            high_water = 0.0 if full else self.high_water()
+            changed = []
+            fetched = 0
+            cursor = None
+            while True:
+                threads, cursor = client.direct_threads_chunk(
+                    thread_message_limit=thread_message_limit, cursor=cursor
+                )
+                fetched += len(threads)
+                changed.extend(self.upsert(threads, message_limit))
+                if not threads or not cursor:
+                    break
+                if not high_water:
+                    # Cold mirror or full resync: the newest ``amount`` threads are enough.
+                    if fetched >= amount:
+                        break
+                elif any(_timestamp(t.last_activity_at) <= high_water for t in threads) and self.count() >= amount:
+                    break
+            self.last_sync = time.monotonic()
+            return changed
+
+    def threads(self, limit: int = 20, offset: int = 0, message_limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Stored threads, newest first, as plain dicts.
+
+        A thread may be stored with more messages than a caller asked for, so
+        ``message_limit`` trims each one to its newest ``message_limit``.
+        """
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT data FROM threads ORDER BY last_activity_at DESC LIMIT ? OFFSET ?", (limit, offset)
+            ).fetchall()
+        threads = [loads(row[0]) for row in rows]
+        if message_limit is not None:
+            for thread in threads:
+                # Instagram lists thread items newest first
+                thread["messages"] = thread.get("messages", [])[:max(message_limit, 0)]
+        return threads
+
+    def participants(self, usernames: List[str]) -> Set[str]:
+        """The (lowercased) ``usernames`` that take part in a mirrored thread."""
+        if not usernames:
+            return set()
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT DISTINCT lower(username) FROM participants WHERE lower(username) IN ({','.join('?' * len(usernames))})",
+                [u.lower() for u in usernames],
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    _ORDER_BY = {
+        "recent": "t.last_activity_at DESC",
+        "rizz": "score DESC, t.last_activity_at DESC",
+    }
+
+    def scored_threads(self, limit: int = 20, offset: int = 0, order: str = "recent") -> List[Tuple[Dict[str, Any], int]]:
+        """Stored threads with their rizzScore, newest first or (``order="rizz"``) best first."""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT t.data, rizz_score(s.reply, s.ratio, t.last_activity_at, ?) AS score"
+                " FROM threads t LEFT JOIN scores s USING (thread_id)"
+                f" ORDER BY {self._ORDER_BY[order]} LIMIT ? OFFSET ?",
+                (time.time(), limit, offset),
+            ).fetchall()
+        return [(loads(data), score) for data, score in rows]
+
+    def versions(self, limit: int = 20, offset: int = 0, order: str = "recent") -> List[Tuple[str, float, int, int]]:
+        """``(thread_id, last_activity_at, message_limit, score)`` for the rows ``scored_threads`` would return.
+
+        Reads only the indexed columns and the scores table, so it is a cheap
+        version of a listing.
+        """
+        with self._lock:
+            return self._connect().execute(
+                "SELECT t.thread_id, t.last_activity_at, t.message_limit, rizz_score(s.reply, s.ratio, t.last_activity_at, ?) AS score"
+                " FROM threads t LEFT JOIN scores s USING (thread_id)"
+                f" ORDER BY {self._ORDER_BY[order]} LIMIT ? OFFSET ?",
+                (time.time(), limit, offset),
+            ).fetchall()
+
+
+_stores: Dict[str, InboxStore] = {}
+_stores_lock = threading.Lock()
+
+
+def inbox_store_for(client) -> InboxStore:
+    """The mirror belonging to the account ``client`` is logged in as."""
+    user_id = str(client.user_id)
+    with _stores_lock:
+        store = _stores.get(user_id)
+        if store is None:
+            store = _stores[user_id] = InboxStore(DATA_DIR / f"inbox_{user_id}.sqlite3", user_id)
+        return store
@@ -109,12 +109,19 @@ export async function listPendingChats(amount: number = 20): Promise<any> {
   return response.json();
 }
 
-export async function searchThreads(query: string): Promise<any> {
-  const response = await fetch(`${API_BASE}/search_threads?query=${encodeURIComponent(query)}`);
+export async function searchThreads(sessionToken: string, query: string, source: 'local' | 'remote' = 'remote'): Promise<any> {
+  const response = await fetch(`${API_BASE}/search_threads?session_token=${encodeURIComponent(sessionToken)}&query=${encodeURIComponent(query)}&source=${source}`);
   if (!response.ok) throw new Error('Failed to search threads');
   return response.json();
 }
 
+/**
+ * Thumbnail URL for a profile picture the backend has seen in an earlier listing.
+ */
+export function avatarUrl(pk: string | number): string {
+  return `${API_BASE}/avatar/${encodeURIComponent(String(pk))}`;
+}
+
 export async function getThreadByParticipants(user_ids: number[]): Promise<any> {
   const response = await fetch(`${API_BASE}/get_thread_by_participants`, {
     method: 'POST',
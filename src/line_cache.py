@@ -0,0 +1,71 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config import DATA_DIR
+from metrics import register_cache
+
+
+class LineCache:
+    """Persistent cache of generated pickup lines.
+
+    Entries are content-addressed: the key hashes the canonical profile JSON
+    together with the model and prompt template version, so any change to
+    one of them naturally misses the cache.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pickup_lines ("
+                " key TEXT PRIMARY KEY, model TEXT NOT NULL, template_version TEXT NOT NULL,"
+                " lines TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def key(profile_details: Dict[str, Any], model: str, template_version: str) -> str:
+        canonical = json.dumps(profile_details, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(f"{model}\0{template_version}\0{canonical}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[List[str]]:
+        with self._lock:
+            row = self._connect().execute("SELECT lines FROM pickup_lines WHERE key = ?", (key,)).fetchone()
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return json.loads(row[0]) if row else None
+
+    def put(self, key: str, lines: List[str], model: str, template_version: str):
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO pickup_lines (key, model, template_version, lines, created_at) VALUES (?, ?, ?, ?, ?)",
+                (key, model, template_version, json.dumps(lines), time.time()),
+            )
+            conn.commit()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        total = self.hits + self.misses
+        return {"pickup_lines": {"hits": self.hits, "misses": self.misses, "hit_ratio": self.hits / total if total else 0.0}}
+
+
+line_cache = LineCache(DATA_DIR / "pickup_lines.sqlite3")
+register_cache("line", line_cache.stats)
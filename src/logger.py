@@ -1,4 +1,105 @@
+"""Structured, non-blocking logging for the request path.
+
+Records are handed to a queue on the calling thread and formatted as one
+JSON object per line by a background listener, so a request never waits on
+stderr or pays for building a big repr. Structured fields travel in
+``extra={"fields": {...}}``; long strings and large containers are
+truncated when formatted. Use ``log_event`` for anything carrying a payload:
+it checks the level before touching its arguments.
+
+The level comes from ``JUSTRIZZ_LOG_LEVEL`` (default INFO).
+"""
+import atexit
 import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+from typing import Any
+
+import orjson
+
+MAX_STRING = int(os.getenv("JUSTRIZZ_LOG_MAX_STRING", "512"))
+MAX_ITEMS = int(os.getenv("JUSTRIZZ_LOG_MAX_ITEMS", "20"))
+MAX_DEPTH = 6
+
+
+def truncate(value: Any, depth: int = 0) -> Any:
+    """A JSON-friendly copy of ``value`` with long strings and containers cut short."""
+    if isinstance(value, str):
+        if len(value) > MAX_STRING:
+            return f"{value[:MAX_STRING]}...<{len(value) - MAX_STRING} more chars>"
+        return value
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if depth >= MAX_DEPTH:
+        return f"<{type(value).__name__}>"
+    if isinstance(value, dict):
+        out = {str(k): truncate(v, depth + 1) for k, v in list(value.items())[:MAX_ITEMS]}
+        if len(value) > MAX_ITEMS:
+            out["..."] = f"<{len(value) - MAX_ITEMS} more keys>"
+        return out
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = list(value)
+        out = [truncate(v, depth + 1) for v in items[:MAX_ITEMS]]
+        if len(items) > MAX_ITEMS:
+            out.append(f"<{len(items) - MAX_ITEMS} more items>")
+        return out
+    return truncate(str(value), depth)
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(truncate(fields))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return orjson.dumps(entry, default=str).decode()
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue the record untouched; formatting happens on the listener thread.
+
+    The stock ``QueueHandler.prepare`` formats on the caller's thread, which
+    is exactly the cost this module exists to keep off the request path.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def _level() -> int:
+    level = os.getenv("JUSTRIZZ_LOG_LEVEL", "INFO").upper()
+    return logging.getLevelName(level) if isinstance(logging.getLevelName(level), int) else logging.INFO
+
+
+_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_stream = logging.StreamHandler(sys.stderr)
+_stream.setFormatter(JSONFormatter())
+_listener = logging.handlers.QueueListener(_queue, _stream, respect_handler_level=True)
+_listener.start()
+atexit.register(_listener.stop)
+
+logger = logging.getLogger("justrizz")
+logger.setLevel(_level())
+logger.addHandler(DeferredQueueHandler(_queue))
+logger.propagate = False
+
+
+def get_logger(name: str) -> logging.Logger:
+    """A child of the ``justrizz`` logger, sharing its queue and level."""
+    return logger.getChild(name)
+
 
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
\ No newline at end of file
+def log_event(log: logging.Logger, level: int, event: str, **fields: Any):
+    """Log ``event`` with structured ``fields``; free when ``level`` is disabled."""
+    if log.isEnabledFor(level):
+        log.log(level, event, extra={"fields": fields})
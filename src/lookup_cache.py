@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from metrics import register_cache
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+class LookupCache:
+    """Shared cache in front of instagrapi profile lookups.
+
+    username <-> pk mappings practically never change and are kept for a day;
+    profile details go stale quickly and are kept for a few minutes.
+    """
+
+    def __init__(self, maxsize: int = 4096, id_ttl: float = 24 * 3600, profile_ttl: float = 300):
+        self.user_ids = TTLCache(maxsize, id_ttl)
+        self.usernames = TTLCache(maxsize, id_ttl)
+        self.profiles = TTLCache(maxsize, profile_ttl)
+
+    def remember(self, username: Optional[str], user_id: Any):
+        if not username or not user_id:
+            return
+        self.user_ids.set(username.lower(), str(user_id))
+        self.usernames.set(str(user_id), username)
+
+    def user_id_from_username(self, client, username: str) -> Optional[str]:
+        user_id = self.user_ids.get(username.lower())
+        if user_id is None:
+            user_id = client.user_id_from_username(username)
+            self.remember(username, user_id)
+        return user_id
+
+    def username_from_user_id(self, client, user_id: Any) -> Optional[str]:
+        username = self.usernames.get(str(user_id))
+        if username is None:
+            username = client.username_from_user_id(user_id)
+            self.remember(username, user_id)
+        return username
+
+    def profile_details(self, client, username: str, extract: Callable[[Any], Dict[str, Any]]) -> Dict[str, Any]:
+        """Return ``extract(user_info)`` for ``username``, cached for ``profile_ttl`` seconds."""
+        key = username.lower()
+        details = self.profiles.get(key, _MISSING)
+        if details is _MISSING:
+            user_info = client.user_info(self.user_id_from_username(client, username))
+            self.remember(getattr(user_info, "username", None), getattr(user_info, "pk", None))
+            details = extract(user_info)
+            self.profiles.set(key, details)
+        return details
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            "user_ids": self.user_ids.stats(),
+            "usernames": self.usernames.stats(),
+            "profiles": self.profiles.stats(),
+        }
+
+
+lookup_cache = LookupCache()
+register_cache("lookup", lookup_cache.stats)
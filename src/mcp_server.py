@@ -1,6 +1,17 @@
+import os
 from fastmcp import FastMCP
-from instagrapi import Client
+from starlette.concurrency import run_in_threadpool
+import config
+from client_pool import client_pool
+from lookup_cache import lookup_cache
+from singleflight import guarded
+from inbox_store import inbox_store_for
+from message_archive import ArchivePager, message_archive_for
+from pagination import pending_inbox_page
+from serialization import dump, loads, project, project_archived_thread, thread_summary
+import metrics
 import argparse
+import functools
 from typing import Optional, List, Dict, Any
 
 
@@ -8,7 +19,8 @@ INSTRUCTIONS = """
 This server is used to send messages to a user on Instagram.
 """
 
-client = Client()
+# The account the tools act as; set by configure() or taken from the environment.
+_account: Dict[str, Optional[str]] = {}
 
 mcp_server = FastMCP(
    name="Instagram DMs",
@@ -16,7 +28,59 @@ mcp_server = FastMCP(
 )
 
 
-@mcp_server.tool()
+def configure(username: Optional[str] = None, password: Optional[str] = None):
+    """Set the Instagram account used by the tools (defaults: JUSTRIZZ_IG_USERNAME / JUSTRIZZ_IG_PASSWORD)."""
+    env_username, env_password = config.instagram_account()
+    _account["username"] = username or env_username
+    _account["password"] = password or env_password
+
+
+def account_configured() -> bool:
+    if not _account:
+        configure()
+    return bool(_account["username"] and _account["password"])
+
+
+def get_client():
+    """The shared pooled client for the configured account.
+
+    It comes from the same pool as the HTTP server's /api/login, so both
+    front doors in one process reuse one session and one set of caches.
+    """
+    if not account_configured():
+        raise RuntimeError("No Instagram account configured; set JUSTRIZZ_IG_USERNAME and JUSTRIZZ_IG_PASSWORD.")
+    return guarded(client_pool.get(_account["username"], _account["password"]))
+
+
+def tool(fn):
+    """Register ``fn`` as an async MCP tool, timed and labelled as ``mcp:<name>`` in the metrics.
+
+    instagrapi is blocking, so the body runs on a worker thread and the event
+    loop (possibly the HTTP server's) stays free for other requests. Tools
+    report failures as ``success: False`` rather than raising, so those
+    results are what counts as an error.
+    """
+    endpoint = f"mcp:{fn.__name__}"
+
+    @functools.wraps(fn)
+    async def instrumented(*args, **kwargs):
+        token = metrics.current_endpoint.set(endpoint)
+        try:
+            with metrics.request_seconds.time(endpoint):
+                result = await run_in_threadpool(fn, *args, **kwargs)
+            if isinstance(result, dict) and result.get("success") is False:
+                metrics.request_errors.inc(endpoint)
+            return result
+        except Exception:
+            metrics.request_errors.inc(endpoint)
+            raise
+        finally:
+            metrics.current_endpoint.reset(token)
+
+    return mcp_server.tool()(instrumented)
+
+
+@tool
 def send_message(username: str, message: str) -> Dict[str, Any]:
     """Send an Instagram direct message to a user by username.
 
@@ -29,7 +93,8 @@ def send_message(username: str, message: str) -> Dict[str, Any]:
     if not username or not message:
         return {"success": False, "message": "Username and message must be provided."}
     try:
-        user_id = client.user_id_from_username(username)
+        client = get_client()
+        user_id = lookup_cache.user_id_from_username(client, username)
         if not user_id:
             return {"success": False, "message": f"User '{username}' not found."}
         dm = client.direct_send(message, [user_id])
@@ -41,7 +106,7 @@ def send_message(username: str, message: str) -> Dict[str, Any]:
         return {"success": False, "message": str(e)}
 
 
-@mcp_server.tool()
+@tool
 def list_chats(
     amount: int = 20,
     selected_filter: str = "",
@@ -60,95 +125,101 @@ def list_chats(
     Returns:
         A dictionary with success status and the list of threads or error message.
     """
-    def thread_summary(thread):
-        t = thread if isinstance(thread, dict) else thread.dict()
-        users = t.get("users", [])
-        user_summaries = [
-            {
-                "username": u.get("username"),
-                "full_name": u.get("full_name"),
-                "pk": u.get("pk")
-            }
-            for u in users
-        ]
-        return {
-            "thread_id": t.get("id"),
-            "thread_title": t.get("thread_title"),
-            "users": user_summaries,
-            "last_activity_at": t.get("last_activity_at"),
-            "last_message": t.get("messages", [{}])[-1] if t.get("messages") else None
-        }
-
-    def filter_fields(thread, fields):
-        t = thread if isinstance(thread, dict) else thread.dict()
-        return {field: t.get(field) for field in fields}
-
     try:
-        threads = client.direct_threads(amount, selected_filter, thread_message_limit)
+        client = get_client()
+        if selected_filter:
+            threads = client.direct_threads(amount, selected_filter, thread_message_limit=thread_message_limit)
+        else:
+            # The unfiltered inbox is served from the local mirror after a delta sync
+            store = inbox_store_for(client)
+            store.sync(client, amount=amount, thread_message_limit=thread_message_limit)
+            threads = store.threads(limit=amount, message_limit=thread_message_limit)
         if full:
-            return {"success": True, "threads": [t.dict() if hasattr(t, 'dict') else str(t) for t in threads]}
+            return {"success": True, "threads": [dump(t) for t in threads]}
         elif fields:
-            return {"success": True, "threads": [filter_fields(t, fields) for t in threads]}
+            return {"success": True, "threads": [project(t, fields) for t in threads]}
         else:
             return {"success": True, "threads": [thread_summary(t) for t in threads]}
     except Exception as e:
         return {"success": False, "message": str(e)}
 
 
-@mcp_server.tool()
-def list_messages(thread_id: str, amount: int = 20) -> Dict[str, Any]:
+@tool
+def list_messages(thread_id: str, amount: int = 20, cursor: Optional[str] = None, fields: Optional[List[str]] = None) -> Dict[str, Any]:
     """Get messages from a specific Instagram Direct Message thread by thread ID, with an optional limit.
 
     Args:
         thread_id: The thread ID to fetch messages from.
         amount: Number of messages to fetch (default 20).
+        cursor: The next_cursor of a previous call, to continue with older messages.
+        fields: If provided, return only these fields for each message.
     Returns:
-        A dictionary with success status and the list of messages or error message.
+        A dictionary with success status, the list of messages and next_cursor, or error message.
     """
     if not thread_id:
         return {"success": False, "message": "Thread ID must be provided."}
+    if amount < 1:
+        return {"success": False, "message": "amount must be at least 1."}
     try:
-        messages = client.direct_messages(thread_id, amount)
-        return {"success": True, "messages": [m.dict() if hasattr(m, 'dict') else str(m) for m in messages]}
+        client = get_client()
+        pager = ArchivePager(client, message_archive_for(client), thread_id, amount)
+        messages, next_cursor = pager.messages(cursor)
+        inbox_store_for(client).index_messages(thread_id, pager.fresh)
+        if fields:
+            return {"success": True, "messages": [project(loads(m), fields) for m in messages], "next_cursor": next_cursor}
+        return {"success": True, "messages": [loads(m) for m in messages], "next_cursor": next_cursor}
     except Exception as e:
         return {"success": False, "message": str(e)}
 
 
-@mcp_server.tool()
-def list_pending_chats(amount: int = 20) -> Dict[str, Any]:
+@tool
+def list_pending_chats(amount: int = 20, cursor: Optional[str] = None, fields: Optional[List[str]] = None) -> Dict[str, Any]:
     """Get Instagram Direct Message threads (chats) from the user's pending inbox.
 
     Args:
         amount: Number of pending threads to fetch (default 20).
+        cursor: The next_cursor of a previous call, to continue with the next page.
+        fields: If provided, return only these fields for each thread.
     Returns:
-        A dictionary with success status and the list of pending threads or error message.
+        A dictionary with success status, the list of pending threads and next_cursor, or error message.
     """
     try:
-        threads = client.direct_pending_inbox(amount)
-        return {"success": True, "threads": [t.dict() if hasattr(t, 'dict') else str(t) for t in threads]}
+        client = get_client()
+        threads, next_cursor = pending_inbox_page(client, amount, cursor)
+        if fields:
+            return {"success": True, "threads": [project(t, fields) for t in threads], "next_cursor": next_cursor}
+        return {"success": True, "threads": [dump(t) for t in threads], "next_cursor": next_cursor}
     except Exception as e:
         return {"success": False, "message": str(e)}
 
 
-@mcp_server.tool()
-def search_threads(query: str) -> Dict[str, Any]:
+@tool
+def search_threads(query: str, source: str = "remote", limit: int = 20) -> Dict[str, Any]:
     """Search Instagram Direct Message threads by username or keyword.
 
     Args:
         query: The search term (username or keyword).
+        source: "remote" asks Instagram (usernames only); "local" prefix-searches the
+            local index of thread titles, participants and message text.
+        limit: Maximum number of local results (default 20).
     Returns:
         A dictionary with success status and the search results or error message.
     """
     if not query:
         return {"success": False, "message": "Query must be provided."}
+    if source not in ("local", "remote"):
+        return {"success": False, "message": "source must be 'local' or 'remote'."}
     try:
+        client = get_client()
+        if source == "local":
+            return {"success": True, "results": inbox_store_for(client).search(query, limit)}
         results = client.direct_search(query)
-        return {"success": True, "results": [r.dict() if hasattr(r, 'dict') else str(r) for r in results]}
+        return {"success": True, "results": [dump(r) for r in results]}
     except Exception as e:
         return {"success": False, "message": str(e)}
 
 
-@mcp_server.tool()
+@tool
 def get_thread_by_participants(user_ids: List[int]) -> Dict[str, Any]:
     """Get an Instagram Direct Message thread by participant user IDs.
 
@@ -160,32 +231,47 @@ def get_thread_by_participants(user_ids: List[int]) -> Dict[str, Any]:
     if not user_ids or not isinstance(user_ids, list):
         return {"success": False, "message": "user_ids must be a non-empty list of user IDs."}
     try:
+        client = get_client()
         thread = client.direct_thread_by_participants(user_ids)
-        return {"success": True, "thread": thread.dict() if hasattr(thread, 'dict') else str(thread)}
+        return {"success": True, "thread": dump(thread)}
     except Exception as e:
         return {"success": False, "message": str(e)}
 
 
-@mcp_server.tool()
-def get_thread_details(thread_id: str, amount: int = 20) -> Dict[str, Any]:
+@tool
+def get_thread_details(
+    thread_id: str,
+    amount: int = 20,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    message_fields: Optional[List[str]] = None,
+) -> Dict[str, Any]:
     """Get details and messages for a specific Instagram Direct Message thread by thread ID, with an optional message limit.
 
     Args:
         thread_id: The thread ID to fetch details for.
         amount: Number of messages to fetch (default 20).
+        cursor: The next_cursor of a previous call, to continue with older messages.
+        fields: If provided, return only these fields of the thread.
+        message_fields: If provided, return only these fields for each message.
     Returns:
-        A dictionary with success status and the thread details or error message.
+        A dictionary with success status, the thread details and next_cursor, or error message.
     """
     if not thread_id:
         return {"success": False, "message": "Thread ID must be provided."}
+    if amount < 1:
+        return {"success": False, "message": "amount must be at least 1."}
     try:
-        thread = client.direct_thread(thread_id, amount)
-        return {"success": True, "thread": thread.dict() if hasattr(thread, 'dict') else str(thread)}
+        client = get_client()
+        pager = ArchivePager(client, message_archive_for(client), thread_id, amount)
+        thread, messages, next_cursor = pager.thread(cursor)
+        inbox_store_for(client).index_messages(thread_id, pager.fresh)
+        return {"success": True, "thread": project_archived_thread(thread, messages, fields, message_fields), "next_cursor": next_cursor}
     except Exception as e:
         return {"success": False, "message": str(e)}
 
 
-@mcp_server.tool()
+@tool
 def get_user_id_from_username(username: str) -> Dict[str, Any]:
     """Get the Instagram user ID for a given username.
 
@@ -197,7 +283,8 @@ def get_user_id_from_username(username: str) -> Dict[str, Any]:
     if not username:
         return {"success": False, "message": "Username must be provided."}
     try:
-        user_id = client.user_id_from_username(username)
+        client = get_client()
+        user_id = lookup_cache.user_id_from_username(client, username)
         if user_id:
             return {"success": True, "user_id": user_id}
         else:
@@ -206,7 +293,7 @@ def get_user_id_from_username(username: str) -> Dict[str, Any]:
         return {"success": False, "message": str(e)}
 
 
-@mcp_server.tool()
+@tool
 def get_username_from_user_id(user_id: str) -> Dict[str, Any]:
     """Get the Instagram username for a given user ID.
 
@@ -218,7 +305,8 @@ def get_username_from_user_id(user_id: str) -> Dict[str, Any]:
     if not user_id:
         return {"success": False, "message": "User ID must be provided."}
     try:
-        username = client.username_from_user_id(user_id)
+        client = get_client()
+        username = lookup_cache.username_from_user_id(client, user_id)
         if username:
             return {"success": True, "username": username}
         else:
@@ -227,11 +315,26 @@ def get_username_from_user_id(user_id: str) -> Dict[str, Any]:
         return {"success": False, "message": str(e)}
 
 
+@mcp_server.resource("metrics://prometheus", mime_type="text/plain")
+def prometheus_metrics() -> str:
+    """Latency histograms, error counters and cache hit ratios in Prometheus text format."""
+    return metrics.render()
+
+
 if __name__ == "__main__":
    parser = argparse.ArgumentParser()
-   parser.add_argument("--username", type=str, required=True)
-   parser.add_argument("--password", type=str, required=True)
+   parser.add_argument("--username", type=str, default=os.getenv("JUSTRIZZ_IG_USERNAME"))
+   parser.add_argument("--password", type=str, default=os.getenv("JUSTRIZZ_IG_PASSWORD"))
+   parser.add_argument("--transport", choices=["stdio", "streamable-http", "sse"], default="stdio")
+   parser.add_argument("--host", type=str, default="127.0.0.1")
+   parser.add_argument("--port", type=int, default=8001)
    args = parser.parse_args()
-
-   client.login(args.username, args.password)
-   mcp_server.run(transport="stdio")
+   if not args.username or not args.password:
+      parser.error("--username and --password (or JUSTRIZZ_IG_USERNAME / JUSTRIZZ_IG_PASSWORD) are required")
+
+   configure(args.username, args.password)
+   get_client()  # log in up front so bad credentials fail at startup
+   if args.transport == "stdio":
+      mcp_server.run(transport="stdio")
+   else:
+      mcp_server.run(transport=args.transport, host=args.host, port=args.port)
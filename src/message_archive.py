@@ -0,0 +1,250 @@
+import itertools
+import json
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from config import DATA_DIR
+from pagination import MAX_CHUNK, ThreadPager, decode_token, encode_token
+
+_MISSING = object()
+# Rows read per query while iterating a thread
+READ_BATCH = 64
+
+
+def _timestamp(value) -> float:
+    return value.timestamp() if value is not None else 0.0
+
+
+def encode_position(timestamp: float, message_id: str) -> str:
+    """Opaque cursor: the archive position of the last message served."""
+    return encode_token({"t": timestamp, "i": message_id})
+
+
+def decode_position(token: Optional[str]) -> Optional[Tuple[float, str]]:
+    if not token:
+        return None
+    return decode_token(token, lambda state: (float(state["t"]), str(state["i"])))
+
+
+class MessageArchive:
+    """Append-only, compressed archive of one account's DM messages.
+
+    Messages are stored once, as zlib-compressed pydantic JSON keyed by
+    ``(thread_id, message_id)`` and indexed by timestamp, so pages are read
+    newest-first with a keyset query and handed out without rebuilding
+    models. ``history`` remembers the upstream cursor where each thread's
+    older messages continue (``None`` there means the archive reaches the
+    start of the thread) and the thread's latest header, i.e. its raw
+    metadata without items.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS messages (
+                    thread_id TEXT NOT NULL,
+                    message_id TEXT NOT NULL,
+                    timestamp REAL NOT NULL,
+                    data BLOB NOT NULL,
+                    PRIMARY KEY (thread_id, message_id)
+                );
+                CREATE INDEX IF NOT EXISTS messages_by_time ON messages (thread_id, timestamp DESC, message_id DESC);
+                CREATE TABLE IF NOT EXISTS history (
+                    thread_id TEXT PRIMARY KEY,
+                    older_cursor TEXT,
+                    header BLOB
+                );
+                """
+            )
+            self._conn = conn
+        return self._conn
+
+    def append(self, thread_id: str, messages) -> List[Any]:
+        """Store ``messages`` not archived yet and return them."""
+        if not messages:
+            return []
+        with self._lock:
+            conn = self._connect()
+            ids = [str(m.id) for m in messages]
+            known = {row[0] for row in conn.execute(
+                f"SELECT message_id FROM messages WHERE thread_id = ? AND message_id IN ({','.join('?' * len(ids))})",
+                [thread_id, *ids],
+            )}
+            fresh = [m for m in messages if str(m.id) not in known]
+            conn.executemany(
+                "INSERT OR IGNORE INTO messages (thread_id, message_id, timestamp, data) VALUES (?, ?, ?, ?)",
+                [(thread_id, str(m.id), _timestamp(m.timestamp), zlib.compress(m.model_dump_json().encode()))
+                 for m in fresh],
+            )
+            conn.commit()
+        return fresh
+
+    def newest(self, thread_id: str) -> Optional[Tuple[float, str]]:
+        with self._lock:
+            return self._connect().execute(
+                "SELECT timestamp, message_id FROM messages WHERE thread_id = ?"
+                " ORDER BY timestamp DESC, message_id DESC LIMIT 1",
+                (thread_id,),
+            ).fetchone()
+
+    def older_cursor(self, thread_id: str, default: Any = None) -> Any:
+        """Upstream cursor for messages older than the archive; ``default`` if never fetched."""
+        with self._lock:
+            row = self._connect().execute("SELECT older_cursor FROM history WHERE thread_id = ?", (thread_id,)).fetchone()
+        return row[0] if row else default
+
+    def set_older_cursor(self, thread_id: str, cursor: Optional[str], header: Optional[Dict[str, Any]] = None):
+        """Remember where older messages continue upstream and, if given, the thread header."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT INTO history (thread_id, older_cursor, header) VALUES (?, ?, ?)"
+                " ON CONFLICT (thread_id) DO UPDATE SET older_cursor = excluded.older_cursor,"
+                " header = COALESCE(excluded.header, history.header)",
+                (thread_id, cursor, self._pack(header)),
+            )
+            conn.commit()
+
+    def set_header(self, thread_id: str, header: Dict[str, Any]):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("UPDATE history SET header = ? WHERE thread_id = ?", (self._pack(header), thread_id))
+            conn.commit()
+
+    def header(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connect().execute("SELECT header FROM history WHERE thread_id = ?", (thread_id,)).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row and row[0] is not None else None
+
+    @staticmethod
+    def _pack(header: Optional[Dict[str, Any]]) -> Optional[bytes]:
+        return zlib.compress(json.dumps(header, separators=(",", ":")).encode()) if header is not None else None
+
+    def iter_messages(self, thread_id: str, before: Optional[Tuple[float, str]] = None) -> Iterator[Tuple[float, str, str]]:
+        """Yield ``(timestamp, message_id, json)`` newest first, strictly older than ``before``.
+
+        Rows are read ``READ_BATCH`` at a time, so only what the caller
+        consumes is ever decompressed or held in memory.
+        """
+        while True:
+            with self._lock:
+                if before is None:
+                    rows = self._connect().execute(
+                        "SELECT timestamp, message_id, data FROM messages WHERE thread_id = ?"
+                        " ORDER BY timestamp DESC, message_id DESC LIMIT ?",
+                        (thread_id, READ_BATCH),
+                    ).fetchall()
+                else:
+                    rows = self._connect().execute(
+                        "SELECT timestamp, message_id, data FROM messages WHERE thread_id = ?"
+                        " AND (timestamp < ? OR (timestamp = ? AND message_id < ?))"
+                        " ORDER BY timestamp DESC, message_id DESC LIMIT ?",
+                        (thread_id, before[0], before[0], before[1], READ_BATCH),
+                    ).fetchall()
+            for timestamp, message_id, data in rows:
+                yield timestamp, message_id, zlib.decompress(data).decode()
+            if len(rows) < READ_BATCH:
+                return
+            before = rows[-1][0], rows[-1][1]
+
+
+class ArchivePager:
+    """Thread pages served from the archive, going upstream only for what it lacks.
+
+    The first page fetches messages newer than the newest archived one;
+    older pages come from the archive and only reach upstream (from the
+    remembered cursor) once a thread's archived history runs out. Pages
+    are lists of message JSON texts and ``ids`` holds the last page's
+    message ids; ``fresh`` collects the models that were fetched, e.g. for
+    the search index.
+    """
+
+    def __init__(self, client, archive: MessageArchive, thread_id: str, amount: int):
+        self.archive = archive
+        self.thread_id = str(thread_id)
+        self.amount = amount
+        self.upstream = ThreadPager(client, self.thread_id, MAX_CHUNK)
+        self.fresh: List[Any] = []
+        self.ids: List[str] = []
+
+    def refresh(self):
+        """Fetch and archive the messages newer than the newest archived one."""
+        newest = self.archive.newest(self.thread_id)
+        cursor = None
+        while True:
+            chunk, older = self.upstream.fetch_chunk(cursor)
+            self.fresh.extend(self.archive.append(self.thread_id, chunk))
+            if not older:
+                break
+            if newest is None:
+                # First visit: one page is enough; older history is fetched on demand
+                if len(self.fresh) >= self.amount:
+                    break
+            elif any(_timestamp(m.timestamp) <= newest[0] for m in chunk):
+                break
+            cursor = older
+        header = dict(self.upstream.raw_thread, items=[])
+        if newest is None or self.archive.older_cursor(self.thread_id, _MISSING) is _MISSING:
+            self.archive.set_older_cursor(self.thread_id, older, header)
+        else:
+            self.archive.set_header(self.thread_id, header)
+
+    def messages(self, token: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+        position = decode_position(token)
+        if position is None or self.archive.older_cursor(self.thread_id, _MISSING) is _MISSING:
+            self.refresh()
+        page: List[str] = []
+        self.ids = []
+        while True:
+            wanted = self.amount - len(page)
+            rows = list(itertools.islice(self.archive.iter_messages(self.thread_id, position), wanted + 1))
+            for timestamp, message_id, data in rows[:wanted]:
+                page.append(data)
+                self.ids.append(message_id)
+                position = timestamp, message_id
+            if len(rows) > wanted:
+                return page, encode_position(*position)
+            older = self.archive.older_cursor(self.thread_id)
+            if older is None:
+                return page, None
+            if len(page) >= self.amount:
+                return page, encode_position(*position)
+            chunk, next_older = self.upstream.fetch_chunk(older)
+            self.fresh.extend(self.archive.append(self.thread_id, chunk))
+            self.archive.set_older_cursor(self.thread_id, next_older)
+
+    def thread(self, token: Optional[str] = None):
+        """The thread (without messages), one page of message JSON texts and the next cursor."""
+        from instagrapi.extractors import extract_direct_thread
+
+        messages, next_cursor = self.messages(token)
+        # Older pages are served without going upstream, so the header comes from the archive too
+        thread = extract_direct_thread(self.archive.header(self.thread_id))
+        return thread, messages, next_cursor
+
+
+_archives: Dict[str, MessageArchive] = {}
+_archives_lock = threading.Lock()
+
+
+def message_archive_for(client) -> MessageArchive:
+    """The archive belonging to the account ``client`` is logged in as."""
+    user_id = str(client.user_id)
+    with _archives_lock:
+        archive = _archives.get(user_id)
+        if archive is None:
+            archive = _archives[user_id] = MessageArchive(DATA_DIR / f"messages_{user_id}.sqlite3")
+        return archive
@@ -0,0 +1,211 @@
+"""In-process metrics in the Prometheus text exposition format.
+
+Request and upstream timings are recorded into histograms labelled by the
+endpoint (or MCP tool) being served and the upstream method called; cache
+statistics are collected at scrape time. ``SamplingProfiler`` is an opt-in
+wall-clock stack sampler for hot-path investigation.
+"""
+import bisect
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import Counter as _Tally
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Endpoint or MCP tool currently being served, used to label upstream calls.
+current_endpoint = contextvars.ContextVar("current_endpoint", default="-")
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+class Gauge(Counter):
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self) -> Iterable[str]:
+        for line in super().render():
+            yield line.replace(" counter", " gauge", 1) if line.startswith("# TYPE") else line
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames, self.buckets = name, help, labelnames, buckets
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # counts per bucket + [sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0.0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, *labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = sorted((labels, list(values)) for labels, values in self._series.items())
+        for labels, values in series:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                le = _labels(self.labelnames, labels, 'le="%s"' % bound)
+                yield f"{self.name}_bucket{le} {cumulative}"
+            le = _labels(self.labelnames, labels, 'le="+Inf"')
+            yield f"{self.name}_bucket{le} {values[-1]}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {values[-2]}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {values[-1]}"
+
+
+request_seconds = Histogram(
+    "justrizz_request_seconds", "Time spent serving an HTTP endpoint or MCP tool.", ("endpoint",))
+request_errors = Counter(
+    "justrizz_request_errors_total", "Endpoint or tool calls that failed.", ("endpoint",))
+upstream_seconds = Histogram(
+    "justrizz_upstream_seconds", "Latency of upstream Instagram and Perplexity calls.", ("endpoint", "method"))
+upstream_errors = Counter(
+    "justrizz_upstream_errors_total", "Upstream calls that raised.", ("endpoint", "method", "exception"))
+
+_metrics = [request_seconds, request_errors, upstream_seconds, upstream_errors]
+_collectors: List[Callable[[], Dict[str, Dict[str, float]]]] = []
+
+
+def register_metric(metric):
+    _metrics.append(metric)
+    return metric
+
+
+def register_cache(name: str, stats: Callable[[], Dict[str, Dict[str, float]]]):
+    """Expose cache statistics, ``stats()`` -> {cache_name: {"hits": .., "misses": .., ...}}.
+
+    Recognised keys: hits, misses, hit_ratio, size, bytes and max_bytes.
+    """
+    _collectors.append(lambda: {f"{name}.{k}": v for k, v in stats().items()})
+
+
+@contextmanager
+def track_upstream(method: str):
+    """Time one upstream call, labelled with the endpoint currently being served."""
+    endpoint = current_endpoint.get()
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        upstream_errors.inc(endpoint, method, type(e).__name__)
+        raise
+    finally:
+        upstream_seconds.observe(time.perf_counter() - start, endpoint, method)
+
+
+def _render_caches() -> Iterable[str]:
+    caches = {}
+    for collect in _collectors:
+        caches.update(collect())
+    for metric, key, kind in (
+        ("justrizz_cache_hits_total", "hits", "counter"),
+        ("justrizz_cache_misses_total", "misses", "counter"),
+        ("justrizz_cache_hit_ratio", "hit_ratio", "gauge"),
+        ("justrizz_cache_entries", "size", "gauge"),
+        ("justrizz_cache_bytes", "bytes", "gauge"),
+        ("justrizz_cache_max_bytes", "max_bytes", "gauge"),
+    ):
+        yield f"# TYPE {metric} {kind}"
+        for cache, stats in sorted(caches.items()):
+            if key in stats:
+                yield f'{metric}{{cache="{_escape(cache)}"}} {float(stats[key])}'
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    lines.extend(_render_caches())
+    return "\n".join(lines) + "\n"
+
+
+class SamplingProfiler:
+    """Samples every thread's stack ``hz`` times a second into collapsed stacks.
+
+    The output (``frame;frame;frame count`` per line) feeds straight into
+    flamegraph.pl or speedscope.
+    """
+
+    def __init__(self, hz: float = 100.0):
+        self.interval = 1.0 / hz
+        self.samples: _Tally = _Tally()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self) -> "SamplingProfiler":
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> str:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common()) + "\n"
+
+
+def profiler_enabled() -> bool:
+    return os.getenv("JUSTRIZZ_PROFILER", "").lower() in ("1", "true", "yes")
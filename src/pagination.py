@@ -0,0 +1,98 @@
+import base64
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from singleflight import guarded
+
+T = TypeVar("T")
+
+# Instagram returns at most this many thread items per request.
+MAX_CHUNK = 20
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_token(state: Dict[str, Any]) -> str:
+    """Opaque, URL-safe token for a small JSON-able cursor state."""
+    raw = json.dumps(state, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_token(token: str, parse: Callable[[Dict[str, Any]], T]) -> T:
+    """Inverse of ``encode_token``; ``parse`` turns the state into the caller's cursor.
+
+    Anything malformed, including what ``parse`` rejects, is an ``InvalidCursor``.
+    """
+    try:
+        return parse(json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))))
+    except (ValueError, KeyError, TypeError):
+        raise InvalidCursor("Invalid cursor.")
+
+
+def encode_cursor(upstream: Optional[str], offset: int = 0) -> str:
+    """Opaque cursor: the upstream cursor of a chunk plus how far into it we got."""
+    return encode_token({"c": upstream, "o": offset})
+
+
+def decode_cursor(token: Optional[str]) -> Tuple[Optional[str], int]:
+    if not token:
+        return None, 0
+    return decode_token(token, lambda state: (state["c"], int(state["o"])))
+
+
+def paginate(fetch_chunk: Callable[[Optional[str]], Tuple[List[Any], Optional[str]]],
+             amount: int, token: Optional[str] = None) -> Tuple[List[Any], Optional[str]]:
+    """Collect ``amount`` items from a cursor-based upstream listing.
+
+    ``fetch_chunk(cursor)`` returns ``(items, next_cursor)``. Returns the items
+    and an opaque cursor for the next page, or ``None`` when exhausted.
+    """
+    cursor, offset = decode_cursor(token)
+    items = []
+    while True:
+        chunk, next_cursor = fetch_chunk(cursor)
+        chunk = chunk[offset:]
+        wanted = amount - len(items)
+        if len(chunk) > wanted:
+            items.extend(chunk[:wanted])
+            return items, encode_cursor(cursor, offset + wanted)
+        items.extend(chunk)
+        if not next_cursor:
+            return items, None
+        cursor, offset = next_cursor, 0
+        if len(items) >= amount:
+            return items, encode_cursor(cursor)
+
+
+class ThreadPager:
+    """Upstream reads of one DM thread's messages, one chunk (newest first) per cursor."""
+
+    def __init__(self, client, thread_id: str, amount: int):
+        self.client = client
+        self.thread_id = thread_id
+        self.amount = amount
+        self.raw_thread: Optional[Dict[str, Any]] = None
+
+    def fetch_chunk(self, cursor: Optional[str]):
+        from instagrapi.extractors import extract_direct_message
+
+        params = {
+            "visual_message_return_type": "unseen",
+            "direction": "older",
+            "seq_id": "40065",
+            "limit": str(min(self.amount, MAX_CHUNK)),
+        }
+        if cursor:
+            params["cursor"] = cursor
+        result = guarded(self.client).private_read(f"direct_v2/threads/{self.thread_id}/", params=params)
+        thread = result["thread"]
+        if self.raw_thread is None:
+            self.raw_thread = thread
+        next_cursor = thread.get("oldest_cursor") if thread.get("has_older") else None
+        return [extract_direct_message(item) for item in thread.get("items", [])], next_cursor
+
+
+def pending_inbox_page(client, amount: int, token: Optional[str] = None):
+    return paginate(lambda cursor: client.direct_pending_chunk(cursor), amount, token)
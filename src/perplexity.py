@@ -0,0 +1,86 @@
+import json
+import logging
+import os
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+from httpx_sse import aconnect_sse
+
+from logger import get_logger, log_event
+from metrics import track_upstream
+
+log = get_logger("perplexity")
+
+PERPLEXITY_API_URL = os.getenv("PERPLEXITY_API_URL", "https://api.perplexity.ai/chat/completions")
+DEFAULT_MODEL = "sonar-pro"
+
+# Connect fails fast; read is generous because completions can take a while.
+TIMEOUT = httpx.Timeout(connect=5.0, read=60.0, write=10.0, pool=5.0)
+LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=120.0)
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+class PerplexityError(Exception):
+    pass
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Process-wide pooled client, created on first use."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(timeout=TIMEOUT, limits=LIMITS)
+    return _http_client
+
+
+async def aclose():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+async def prewarm():
+    """Open a pooled connection (DNS, TCP and TLS) to the API host ahead of the first completion."""
+    url = httpx.URL(PERPLEXITY_API_URL)
+    await get_http_client().head(url.copy_with(path="/", query=None))
+
+
+def _headers() -> Dict[str, str]:
+    return {
+        "accept": "application/json",
+        "content-type": "application/json",
+        "Authorization": f"Bearer {os.getenv('PERPLEXITY_API_KEY')}",
+    }
+
+
+async def complete(messages: List[Dict[str, str]], model: str = DEFAULT_MODEL) -> str:
+    """Run a chat completion and return the stripped content of the first choice."""
+    data = {"model": model, "messages": messages}
+    with track_upstream("perplexity.chat_completions"):
+        response = await get_http_client().post(PERPLEXITY_API_URL, headers=_headers(), json=data)
+    if response.status_code != 200:
+        raise PerplexityError(f"Perplexity API error: {response.text}")
+    result = response.json()
+    log_event(log, logging.DEBUG, "perplexity.response", model=model, response=result)
+    return result.get("choices", [{}])[0].get("message", {}).get("content", "").strip()
+
+
+async def stream(messages: List[Dict[str, str]], model: str = DEFAULT_MODEL) -> AsyncIterator[str]:
+    """Yield content deltas as Perplexity produces them."""
+    data = {"model": model, "messages": messages, "stream": True}
+    with track_upstream("perplexity.chat_completions.stream"):
+        async with aconnect_sse(get_http_client(), "POST", PERPLEXITY_API_URL, headers=_headers(), json=data) as source:
+            if source.response.status_code != 200:
+                body = await source.response.aread()
+                raise PerplexityError(f"Perplexity API error: {body.decode(errors='replace')}")
+            async for event in source.aiter_sse():
+                if event.data == "[DONE]":
+                    break
+                chunk = json.loads(event.data)
+                choice = chunk.get("choices", [{}])[0]
+                delta = choice.get("delta", {}).get("content")
+                if delta:
+                    yield delta
+                if choice.get("finish_reason"):
+                    break
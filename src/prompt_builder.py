@@ -0,0 +1,134 @@
+"""Compact pickup-line prompts within a per-model input token budget.
+
+Only the profile fields the model can actually riff on are sent, as short
+``key: value`` lines instead of indented JSON; the bio is what gets cut when
+a prompt would exceed the model's budget. Templates are versioned, and the
+version is part of the pickup-line cache key, so editing a template never
+serves lines generated from an older one.
+"""
+import math
+from typing import Any, Dict, List, NamedTuple
+
+import perplexity
+from metrics import Histogram, register_metric
+
+TEMPLATES = {
+    "3": {
+        "system": "Reply with one pickup line only. No preamble, quotes or explanation.",
+        "user": "Write a creative, friendly pickup line for me to DM @{username}, based on their Instagram profile:\n{profile}",
+    },
+}
+TEMPLATE_VERSION = "3"
+
+# Input token budget per model; the prompt is trimmed to fit.
+TOKEN_BUDGETS = {
+    "sonar": 160,
+    "sonar-pro": 192,
+    "sonar-reasoning": 192,
+    "sonar-reasoning-pro": 192,
+}
+DEFAULT_BUDGET = 160
+MAX_BIO_CHARS = 300
+# Chat formatting overhead per message (role markers etc.)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+prompt_tokens = register_metric(Histogram(
+    "justrizz_prompt_tokens", "Estimated input tokens per pickup-line prompt.", ("model",),
+    buckets=(32, 64, 96, 128, 192, 256, 384, 512, 1024),
+))
+
+
+class Prompt(NamedTuple):
+    messages: List[Dict[str, str]]
+    profile: Dict[str, Any]  # the compacted profile
+    model: str
+    template_version: str
+    tokens: int
+    username: str
+
+    @property
+    def cache_profile(self) -> Dict[str, Any]:
+        """What the line cache keys on: the compact profile plus the (lowercased) recipient.
+
+        Different accounts can compact to the same profile (same name and
+        follower bucket, or nothing at all), while the prompt names the
+        recipient, so the username has to be part of the key.
+        """
+        return dict(self.profile, username=self.username.lower())
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English BPE vocabularies)."""
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def _round_count(value: Any) -> str:
+    try:
+        n = int(value)
+    except (TypeError, ValueError):
+        return ""
+    if n >= 1_000_000:
+        return f"{n / 1_000_000:.1f}M".replace(".0M", "M")
+    if n >= 1_000:
+        return f"{n / 1_000:.0f}k"
+    return str(n)
+
+
+def _truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    if limit <= 1:
+        return ""
+    cut = text[:limit - 1].rsplit(" ", 1)[0] or text[:limit - 1]
+    return cut.rstrip(" ,.;:-") + "…"
+
+
+def compact_profile(profile_details: Dict[str, Any]) -> Dict[str, Any]:
+    """The fields worth sending; URLs, privacy flags and exact counts are dropped."""
+    compact = {}
+    name = (profile_details.get("full_name") or "").strip()
+    if name:
+        compact["name"] = name
+    bio = " ".join((profile_details.get("bio") or "").split())
+    if bio:
+        compact["bio"] = _truncate(bio, MAX_BIO_CHARS)
+    followers = _round_count(profile_details.get("followers"))
+    if followers and followers != "0":
+        compact["followers"] = followers
+    if profile_details.get("is_verified"):
+        compact["verified"] = "yes"
+    return compact
+
+
+def _profile_text(compact: Dict[str, Any]) -> str:
+    return "\n".join(f"{key}: {value}" for key, value in compact.items()) or "(empty profile)"
+
+
+def _messages(template: Dict[str, str], username: str, compact: Dict[str, Any]) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": template["system"]},
+        {"role": "user", "content": template["user"].format(username=username, profile=_profile_text(compact))},
+    ]
+
+
+def _count(messages: List[Dict[str, str]]) -> int:
+    return sum(estimate_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def build(profile_details: Dict[str, Any], username: str, model: str = perplexity.DEFAULT_MODEL) -> Prompt:
+    """Build the pickup-line prompt for ``username``, trimming the bio to the model's budget."""
+    template = TEMPLATES[TEMPLATE_VERSION]
+    budget = TOKEN_BUDGETS.get(model, DEFAULT_BUDGET)
+    compact = compact_profile(profile_details)
+    messages = _messages(template, username, compact)
+    tokens = _count(messages)
+    if tokens > budget and "bio" in compact:
+        bio = compact["bio"]
+        keep = max(0, len(bio) - (tokens - budget) * 4)
+        compact = dict(compact, bio=_truncate(bio, keep))
+        if not compact["bio"]:
+            del compact["bio"]
+        messages = _messages(template, username, compact)
+        tokens = _count(messages)
+    prompt_tokens.observe(tokens, model)
+    return Prompt(messages, compact, model, TEMPLATE_VERSION, tokens, username)
@@ -0,0 +1,80 @@
+"""rizzScore: how engaged a DM thread is, from its message history alone.
+
+Three signals, each in [0, 1]:
+
+- reply: how quickly the other side answers our messages (median latency,
+  1.0 for instant replies, 0.5 at ``REPLY_HALF_LIFE``);
+- ratio: how much they write compared to us, capped at 1.0 once they
+  write at least as much;
+- recency: how recently the thread was active (0.5 at ``RECENCY_HALF_LIFE``).
+
+reply and ratio only change when the thread gets new messages, so they are
+computed once per change and stored; recency depends on the clock and is
+applied when the score is read.
+"""
+import statistics
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+# Bump when the components change so stored values are recomputed.
+VERSION = 1
+
+REPLY_WEIGHT = 0.4
+RATIO_WEIGHT = 0.35
+RECENCY_WEIGHT = 0.25
+
+REPLY_HALF_LIFE = 3600.0
+RECENCY_HALF_LIFE = 3 * 24 * 3600.0
+NO_REPLY_DATA = 0.5  # they wrote, but never in answer to us
+
+
+def _seconds(value: Any) -> float:
+    if value is None:
+        return 0.0
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+
+
+def _messages(thread: Any) -> List[Tuple[float, str]]:
+    """(timestamp, sender id) for a DirectThread model or its stored dict, oldest first."""
+    if isinstance(thread, dict):
+        raw = [(m.get("timestamp"), m.get("user_id")) for m in thread.get("messages") or []]
+    else:
+        raw = [(m.timestamp, m.user_id) for m in thread.messages or []]
+    return sorted((_seconds(ts), str(sender)) for ts, sender in raw if ts is not None)
+
+
+def components(thread: Any, self_id: Optional[str]) -> Tuple[float, float]:
+    """The stored part of the score: ``(reply, ratio)``."""
+    messages = _messages(thread)
+    self_id = str(self_id)
+    ours = sum(1 for _, sender in messages if sender == self_id)
+    theirs = len(messages) - ours
+    if not theirs:
+        return 0.0, 0.0
+    ratio = min(1.0, theirs / ours) if ours else 1.0
+
+    latencies = []
+    waiting_since = None
+    for ts, sender in messages:
+        if sender == self_id:
+            if waiting_since is None:
+                waiting_since = ts
+        elif waiting_since is not None:
+            latencies.append(max(0.0, ts - waiting_since))
+            waiting_since = None
+    if not latencies:
+        return NO_REPLY_DATA, ratio
+    reply = 1.0 / (1.0 + statistics.median(latencies) / REPLY_HALF_LIFE)
+    return reply, ratio
+
+
+def score(reply: float, ratio: float, last_activity_at: float, now: float) -> int:
+    """Combine stored components with recency into a 0-100 score."""
+    age = max(0.0, now - (last_activity_at or 0.0))
+    recency = 1.0 / (1.0 + age / RECENCY_HALF_LIFE) if last_activity_at else 0.0
+    return round(100 * (REPLY_WEIGHT * (reply or 0.0) + RATIO_WEIGHT * (ratio or 0.0) + RECENCY_WEIGHT * recency))
+
@@ -0,0 +1,179 @@
+"""Serialization helpers shared by the HTTP and MCP servers.
+
+instagrapi models are never round-tripped through ``.dict()`` plus a second
+JSON encoder: projections read attributes through precompiled extractors,
+full dumps go through pydantic's own serializer, and HTTP responses are
+rendered with orjson.
+"""
+import json
+import operator
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import orjson
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+_INT64_MIN = -2 ** 63
+_UINT64_MAX = 2 ** 64 - 1
+_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_SUBCLASS
+
+
+class BigInt(int):
+    """An int outside orjson's 64-bit range (Instagram thread ids), emitted verbatim."""
+
+
+def _default(obj: Any) -> Any:
+    # orjson handles datetimes, UUIDs and dataclasses natively; this covers the rest
+    if isinstance(obj, BigInt):
+        return orjson.Fragment(int.__repr__(obj))
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, dict):
+        return dict(obj)
+    if isinstance(obj, (list, set, frozenset, tuple)):
+        return list(obj)
+    return str(obj)  # HttpUrl, Decimal, Path, str subclasses, ...
+
+
+def _widen(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _widen(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_widen(v) for v in value]
+    if type(value) is int and not _INT64_MIN <= value <= _UINT64_MAX:
+        return BigInt(value)
+    return value
+
+
+def dumps(content: Any) -> bytes:
+    try:
+        return orjson.dumps(content, default=_default, option=_OPTIONS)
+    except orjson.JSONEncodeError as e:
+        if "64-bit" not in str(e):
+            raise
+        return orjson.dumps(_widen(content), default=_default, option=_OPTIONS)
+
+
+def _parse_int(text: str) -> int:
+    value = int(text)
+    return value if _INT64_MIN <= value <= _UINT64_MAX else BigInt(value)
+
+
+def loads(data: str) -> Any:
+    """Parse stored JSON, keeping oversized ints cheap to re-encode."""
+    return json.loads(data, parse_int=_parse_int)
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def safe_val(val: Any) -> Any:
+    if isinstance(val, (str, int, bool, float, type(None))):
+        return val
+    return str(val)
+
+
+def dump(obj: Any) -> Any:
+    """JSON-compatible plain data for a model (used where a dict is required, e.g. MCP)."""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (dict, list)):
+        return obj
+    return str(obj)
+
+
+def fragment(obj: Any) -> Any:
+    """Pre-serialized JSON for a model, embedded verbatim by ``ORJSONResponse``."""
+    if isinstance(obj, BaseModel):
+        return orjson.Fragment(obj.model_dump_json())
+    if isinstance(obj, (dict, list)):
+        return obj
+    return str(obj)
+
+
+def stored(text: str) -> Any:
+    """JSON text kept on disk (e.g. an archived message), embedded verbatim by ``ORJSONResponse``."""
+    return orjson.Fragment(text)
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Split a comma separated ``fields`` query parameter."""
+    if not fields:
+        return None
+    return [f.strip() for f in fields.split(",") if f.strip()] or None
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    return value
+
+
+@lru_cache(maxsize=256)
+def extractor(model_cls: type, fields: Tuple[str, ...]) -> Callable[[Any], Dict[str, Any]]:
+    """Build (once per model class and field list) a function projecting ``fields``."""
+    known = tuple(f for f in fields if f in getattr(model_cls, "model_fields", {}))
+    if not known:
+        return lambda obj: dict.fromkeys(fields)
+    getter = operator.attrgetter(*known)
+    single = len(known) == 1
+    missing = tuple(f for f in fields if f not in known)
+
+    def extract(obj: Any) -> Dict[str, Any]:
+        values = (getter(obj),) if single else getter(obj)
+        out = {field: _plain(value) for field, value in zip(known, values)}
+        for field in missing:
+            out[field] = None
+        return out
+
+    return extract
+
+
+def project(obj: Any, fields: List[str]) -> Dict[str, Any]:
+    """Build only the requested keys of ``obj`` without dumping the whole model."""
+    if isinstance(obj, dict):
+        return {field: obj.get(field) for field in fields}
+    return extractor(type(obj), tuple(fields))(obj)
+
+
+def project_archived_thread(thread: Any, messages: List[str], fields: Optional[List[str]] = None,
+                            message_fields: Optional[List[str]] = None,
+                            encode: Callable[[str], Any] = loads) -> Dict[str, Any]:
+    """Project a DirectThread whose messages are archived JSON texts, optionally projecting those separately."""
+    if fields:
+        body = project(thread, [f for f in fields if f != "messages"])
+    else:
+        body = thread.model_dump(mode="json", exclude={"messages"})
+    if not fields or "messages" in fields:
+        if message_fields:
+            body["messages"] = [project(loads(m), message_fields) for m in messages]
+        else:
+            body["messages"] = [encode(m) for m in messages]
+    return body
+
+
+def thread_summary(thread: Any, encode: Callable[[Any], Any] = dump) -> Dict[str, Any]:
+    if isinstance(thread, dict):
+        messages = thread.get("messages")
+        return {
+            "thread_id": thread.get("id"),
+            "thread_title": thread.get("thread_title"),
+            "users": [
+                {"username": u.get("username"), "full_name": u.get("full_name"), "pk": u.get("pk")}
+                for u in thread.get("users", [])
+            ],
+            "last_activity_at": thread.get("last_activity_at"),
+            "last_message": messages[-1] if messages else None,
+        }
+    return {
+        "thread_id": thread.id,
+        "thread_title": thread.thread_title,
+        "users": [{"username": u.username, "full_name": u.full_name, "pk": u.pk} for u in thread.users],
+        "last_activity_at": thread.last_activity_at,
+        "last_message": encode(thread.messages[-1]) if thread.messages else None,
+    }
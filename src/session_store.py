@@ -0,0 +1,222 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Optional
+from uuid import uuid4
+
+from client_pool import client_class
+from config import DATA_DIR
+from metrics import register_cache
+
+if TYPE_CHECKING:
+    import instagrapi
+
+# Rough resident cost of an instagrapi Client (requests session, adapters,
+# model caches) on top of its serialized settings.
+CLIENT_OVERHEAD_BYTES = 64 * 1024
+TOUCH_INTERVAL = 60.0
+
+
+class _Session:
+    __slots__ = ("client", "username", "last_used", "last_touched", "size")
+
+    def __init__(self, client: "instagrapi.Client", username: str, size: int):
+        self.client = client
+        self.username = username
+        self.last_used = self.last_touched = time.time()
+        self.size = size
+
+
+class SessionStore:
+    """Session token -> logged-in client, bounded and persisted.
+
+    Sessions idle for longer than ``idle_ttl`` expire. In memory, the least
+    recently used sessions are dropped once ``max_entries`` or ``max_bytes``
+    is exceeded (prewarmed sessions count against ``max_bytes`` too and go
+    first); their settings stay on disk, so the next request for that token
+    (or the first one after a restart) rehydrates the client without logging
+    in again.
+    """
+
+    def __init__(self, directory: Path, idle_ttl: float = 7 * 24 * 3600,
+                 max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024):
+        self.directory = directory
+        self.idle_ttl = idle_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sessions = OrderedDict()  # token -> _Session
+        self._warm: Dict[str, _Session] = {}  # file name -> prewarmed session, see prewarm()
+        self._bytes = 0
+        self._warm_bytes = 0
+        self._lock = threading.RLock()
+        self._last_sweep = 0.0
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-store")
+
+    def _path(self, token: str) -> Path:
+        # Tokens are bearer secrets, so only their digest touches the filesystem.
+        return self.directory / f"{hashlib.sha256(token.encode()).hexdigest()}.json"
+
+    def _write(self, token: str, username: str, settings: Dict[str, Any]):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(token)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"username": username, "settings": settings}))
+        os.replace(tmp, path)
+
+    def _insert(self, token: str, session: _Session):
+        old = self._sessions.pop(token, None)
+        if old is not None:
+            self._bytes -= old.size
+        self._sessions[token] = session
+        self._bytes += session.size
+        # Evicted sessions remain on disk and are rehydrated on their next use
+        while self._warm and self._bytes + self._warm_bytes > self.max_bytes:
+            self._drop_warm()
+        while len(self._sessions) > 1 and (len(self._sessions) > self.max_entries or self._bytes > self.max_bytes):
+            _, evicted = self._sessions.popitem(last=False)
+            self._bytes -= evicted.size
+
+    def _drop_warm(self, name: Optional[str] = None) -> Optional[_Session]:
+        # Without a name, drops the least recently used prewarmed session
+        if name is None:
+            _, session = self._warm.popitem()
+        else:
+            session = self._warm.pop(name, None)
+        if session is not None:
+            self._warm_bytes -= session.size
+        return session
+
+    def create(self, client: "instagrapi.Client", username: str) -> str:
+        """Register a freshly logged-in client and return its session token."""
+        token = str(uuid4())
+        settings = client.get_settings()
+        size = len(json.dumps(settings)) + CLIENT_OVERHEAD_BYTES
+        with self._lock:
+            self._insert(token, _Session(client, username, size))
+        self._writer.submit(self._write, token, username, settings)
+        self._sweep()
+        return token
+
+    def _rehydrate(self, token: str) -> Optional[_Session]:
+        path = self._path(token)
+        with self._lock:
+            session = self._drop_warm(path.name)
+        return session if session is not None else self._load(path)
+
+    def _load(self, path: Path) -> Optional[_Session]:
+        try:
+            if time.time() - path.stat().st_mtime > self.idle_ttl:
+                path.unlink(missing_ok=True)
+                return None
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+        client = client_class()()
+        client.set_settings(data["settings"])
+        return _Session(client, data["username"], len(json.dumps(data["settings"])) + CLIENT_OVERHEAD_BYTES)
+
+    def get(self, token: str) -> Optional["instagrapi.Client"]:
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is not None:
+                if now - session.last_used > self.idle_ttl:
+                    self.remove(token)
+                    return None
+                self._sessions.move_to_end(token)
+        if session is None:
+            session = self._rehydrate(token)
+            if session is None:
+                return None
+            with self._lock:
+                # Another request may have rehydrated the same token meanwhile
+                existing = self._sessions.get(token)
+                if existing is not None:
+                    session = existing
+                else:
+                    self._insert(token, session)
+        session.last_used = now
+        if now - session.last_touched > TOUCH_INTERVAL:
+            # Disk mtime doubles as the idle clock for sessions not in memory
+            session.last_touched = now
+            self._writer.submit(self._touch, token)
+        self._sweep()
+        return session.client
+
+    def prewarm(self, limit: int = 32) -> int:
+        """Rehydrate the most recently used sessions on disk before their first request.
+
+        Only token digests are stored, so the clients wait in ``_warm`` until
+        their token shows up, counted against ``max_bytes``; loading stops
+        once it is reached. Returns the number of sessions loaded.
+        """
+        if not self.directory.exists():
+            return 0
+        paths = sorted(self.directory.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+        loaded = 0
+        for path in paths[:limit]:
+            session = self._load(path)
+            if session is None:
+                continue
+            with self._lock:
+                if self._bytes + self._warm_bytes + session.size > self.max_bytes:
+                    break
+                if path.name not in self._warm:
+                    self._warm[path.name] = session
+                    self._warm_bytes += session.size
+            loaded += 1
+        return loaded
+
+    def _touch(self, token: str):
+        try:
+            os.utime(self._path(token))
+        except OSError:
+            pass
+
+    def remove(self, token: str):
+        with self._lock:
+            session = self._sessions.pop(token, None)
+            if session is not None:
+                self._bytes -= session.size
+            self._drop_warm(self._path(token).name)
+        self._writer.submit(self._path(token).unlink, missing_ok=True)
+
+    def _sweep(self):
+        now = time.time()
+        with self._lock:
+            if now - self._last_sweep < TOUCH_INTERVAL:
+                return
+            self._last_sweep = now
+            expired = [t for t, s in self._sessions.items() if now - s.last_used > self.idle_ttl]
+        for token in expired:
+            self.remove(token)
+        self._writer.submit(self._sweep_disk, now)
+
+    def _sweep_disk(self, now: float):
+        if not self.directory.exists():
+            return
+        for path in self.directory.glob("*.json"):
+            try:
+                if now - path.stat().st_mtime > self.idle_ttl:
+                    path.unlink()
+            except OSError:
+                pass
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                "active": {"size": len(self._sessions), "bytes": self._bytes, "max_bytes": self.max_bytes},
+                "prewarmed": {"size": len(self._warm), "bytes": self._warm_bytes},
+            }
+
+
+session_store = SessionStore(DATA_DIR / "sessions")
+register_cache("session", session_store.stats)
@@ -0,0 +1,127 @@
+import threading
+import weakref
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable
+
+from metrics import Counter, register_metric, track_upstream
+
+# Client methods that only read, and are therefore safe to share between callers.
+COALESCED_METHODS = frozenset({
+    "direct_threads",
+    "direct_threads_chunk",
+    "direct_pending_inbox",
+    "direct_pending_chunk",
+    "direct_messages",
+    "direct_thread",
+    "direct_thread_by_participants",
+    "direct_search",
+    "user_id_from_username",
+    "username_from_user_id",
+    "user_info",
+})
+
+
+coalesced_calls = register_metric(Counter(
+    "justrizz_upstream_coalesced_total", "Upstream calls served by joining an identical in-flight call.", ("method",)))
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one execution and its result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any], label: str = "-") -> Any:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            coalesced_calls.inc(label)
+            return future.result()
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return future.result()
+
+
+def _freeze(value: Any) -> Hashable:
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class GuardedClient:
+    """Thread-safe view of a shared instagrapi Client.
+
+    Every method call holds the client's lock, since a Client carries mutable
+    request state and is not safe to use from several threads at once. Read
+    calls in ``COALESCED_METHODS`` (and ``private_read``) are additionally
+    single-flighted on (client, method, args), so identical concurrent
+    requests reach Instagram once.
+    """
+
+    def __init__(self, client, lock: threading.RLock, flights: SingleFlight):
+        object.__setattr__(self, "_client", client)
+        object.__setattr__(self, "_lock", lock)
+        object.__setattr__(self, "_flights", flights)
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+        return self._wrap(name, attr, name in COALESCED_METHODS)
+
+    def private_read(self, endpoint: str, params=None):
+        """``private_request`` for read-only endpoints, single-flighted like the read methods.
+
+        ``private_request`` itself also carries POSTs, so it is only locked.
+        """
+        return self._wrap("private_request", self._client.private_request, True)(endpoint, params=params)
+
+    def _wrap(self, name: str, attr: Callable, coalesce: bool) -> Callable:
+        client, lock, flights = self._client, self._lock, self._flights
+
+        def locked(*args, **kwargs):
+            with lock, track_upstream(name):
+                return attr(*args, **kwargs)
+
+        if not coalesce:
+            return locked
+
+        def coalesced(*args, **kwargs):
+            key = (id(client), name, _freeze(args), _freeze(kwargs))
+            try:
+                hash(key)
+            except TypeError:
+                return locked(*args, **kwargs)
+            return flights.do(key, lambda: locked(*args, **kwargs), name)
+
+        return coalesced
+
+    def __setattr__(self, name: str, value: Any):
+        setattr(self._client, name, value)
+
+
+_flights = SingleFlight()
+_locks = weakref.WeakKeyDictionary()
+_locks_guard = threading.Lock()
+
+
+def guarded(client) -> GuardedClient:
+    """Wrap ``client`` so concurrent handlers share its lock and in-flight reads."""
+    if isinstance(client, GuardedClient):
+        return client
+    with _locks_guard:
+        lock = _locks.get(client)
+        if lock is None:
+            lock = _locks[client] = threading.RLock()
+    return GuardedClient(client, lock, _flights)